@@ -0,0 +1,171 @@
+# answer_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Directory shared by the app and the build_qa_vectors_* scripts
+CACHE_DIR = os.getenv("MEDIMIND_CACHE_DIR", ".medimind_cache")
+
+
+def _generation_path(collection_name: str) -> str:
+    return os.path.join(CACHE_DIR, f"{collection_name}.generation")
+
+
+def mark_collection_rebuilt(collection_name: str):
+    """
+    Record that a Qdrant collection was rebuilt.
+    Every answer cache attached to this collection drops its entries on its next lookup.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(_generation_path(collection_name), "w") as f:
+        f.write(str(time.time_ns()))
+
+
+def read_collection_generation(collection_name: str) -> str:
+    """Return the current rebuild marker of a collection ('' if it was never rebuilt)"""
+    try:
+        with open(_generation_path(collection_name)) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+class _CacheEntry:
+    __slots__ = ("doc_ids", "answer", "created_at")
+
+    def __init__(self, doc_ids: tuple, answer: str, created_at: float):
+        self.doc_ids = doc_ids
+        self.answer = answer
+        self.created_at = created_at
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed on the query embedding.
+    A lookup hits when a cached question is within `max_distance` (cosine distance)
+    of the new one and was answered from the same retrieved documents.
+    """
+
+    def __init__(self, collection_name: str, max_entries: int = 512,
+                 ttl_seconds: float = 3600.0, max_distance: float = 0.05,
+                 generation_check_interval: float = 5.0):
+        self.collection_name = collection_name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.generation_check_interval = generation_check_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._vectors = None  # (max_entries, dim) float32, allocated on first put
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._entries = OrderedDict()  # slot -> _CacheEntry, least recently used first
+        self._generation = read_collection_generation(collection_name)
+        self._generation_checked_at = time.monotonic()
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def _check_generation(self):
+        now = time.monotonic()
+        if now - self._generation_checked_at < self.generation_check_interval:
+            return
+        self._generation_checked_at = now
+        generation = read_collection_generation(self.collection_name)
+        if generation != self._generation:
+            self._generation = generation
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._valid[:] = False
+
+    def _drop(self, slot: int):
+        del self._entries[slot]
+        self._valid[slot] = False
+
+    def _drop_expired(self, now: float):
+        expired = [s for s, e in self._entries.items() if now - e.created_at > self.ttl_seconds]
+        for slot in expired:
+            self._drop(slot)
+        self.evictions += len(expired)
+
+    def get(self, query_vector: Sequence[float], doc_ids: List) -> Optional[str]:
+        """Return a cached answer for a close enough question with the same documents, or None"""
+        q = self._normalize(query_vector)
+        doc_ids = tuple(doc_ids)
+        with self._lock:
+            self._check_generation()
+            if not self._entries or self._vectors is None:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            sims = self._vectors @ q
+            sims[~self._valid] = -np.inf
+            min_similarity = 1.0 - self.max_distance
+            for slot in np.argsort(-sims):
+                if sims[slot] < min_similarity:
+                    break
+                slot = int(slot)
+                entry = self._entries[slot]
+                if now - entry.created_at > self.ttl_seconds:
+                    self._drop(slot)
+                    self.evictions += 1
+                    continue
+                if entry.doc_ids == doc_ids:
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    return entry.answer
+
+            self.misses += 1
+            return None
+
+    def put(self, query_vector: Sequence[float], doc_ids: List, answer: str):
+        """Store an answer, evicting expired and then least recently used entries when full"""
+        q = self._normalize(query_vector)
+        with self._lock:
+            self._check_generation()
+            if self._vectors is None or self._vectors.shape[1] != q.shape[0]:
+                self._vectors = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+                self._clear()
+
+            now = time.time()
+            if len(self._entries) >= self.max_entries:
+                self._drop_expired(now)
+            if len(self._entries) >= self.max_entries:
+                slot, _ = self._entries.popitem(last=False)
+                self._valid[slot] = False
+                self.evictions += 1
+
+            slot = int(np.flatnonzero(~self._valid)[0])
+            self._vectors[slot] = q
+            self._valid[slot] = True
+            self._entries[slot] = _CacheEntry(tuple(doc_ids), answer, now)
+
+    def invalidate(self):
+        """Drop every cached answer"""
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
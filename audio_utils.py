@@ -1,53 +1,163 @@
 # audio_utils.py
-import sounddevice as sd
+import io
+import tempfile
+import threading
+
 import numpy as np
 import scipy.io.wavfile as wav
-import tempfile
-from faster_whisper import WhisperModel
+import sounddevice as sd
+from scipy.signal import resample_poly
 from TTS.api import TTS
 
+from transcription import get_transcriber
+from tts_cache import TTSCache, speech_key
+from vad import VADConfig, capture_utterance, microphone_blocks
+
+WHISPER_SAMPLE_RATE = 16000
+
+
+def record_pcm(duration=5, fs=WHISPER_SAMPLE_RATE):
+    """Record from the microphone; returns mono float32 samples in [-1, 1]"""
+    print("Recording...")
+    audio = sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype="float32")
+    sd.wait()
+    print("Recording complete.")
+    return audio[:, 0]
+
+
+def record_utterance(config=VADConfig(), fs=WHISPER_SAMPLE_RATE):
+    """
+    Record from the microphone until the speaker has been silent for `config.trailing_silence_ms`
+    (at most `config.max_seconds`); returns float32 samples, empty when nobody spoke.
+    """
+    print("Listening...")
+    blocks = microphone_blocks(fs, config.frame_ms)
+    try:
+        utterance = capture_utterance(blocks, fs, config)
+    finally:
+        blocks.close()
+    print(f"Recording complete ({utterance.stopped_by}, {utterance.seconds:.1f}s).")
+    return utterance.samples
+
 
 def record_audio(duration=5, fs=16000):
     """
     Record audio from microphone for a given duration and sample rate.
-    Returns the path to the temporary WAV file.
+    Returns the path to the temporary WAV file (for offline use; the app uses record_utterance).
     """
-    st = "Recording..."
-    print(st)
-    audio = sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype='int16')
-    sd.wait()
-    print("Recording complete.")
-
+    samples = record_pcm(duration, fs)
     temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-    wav.write(temp_wav.name, fs, audio)
+    wav.write(temp_wav.name, fs, float_to_int16(samples))
     return temp_wav.name
 
+
+def float_to_int16(samples):
+    return (np.clip(np.asarray(samples, dtype=np.float32), -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def to_whisper_pcm(samples, fs):
+    """Mono float32 samples at Whisper's 16 kHz, from any sample rate, integer PCM or stereo"""
+    samples = np.asarray(samples)
+    if samples.dtype.kind in "iu":
+        samples = samples.astype(np.float32) / np.iinfo(samples.dtype).max
+    samples = samples.astype(np.float32, copy=False)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    if fs != WHISPER_SAMPLE_RATE:
+        divisor = np.gcd(int(fs), WHISPER_SAMPLE_RATE)
+        samples = resample_poly(samples, WHISPER_SAMPLE_RATE // divisor, int(fs) // divisor).astype(np.float32)
+    return samples
+
+
+def transcribe_pcm(samples, fs=WHISPER_SAMPLE_RATE):
+    """Transcribe in-memory PCM samples without touching the disk; returns (text, language)"""
+    result = get_transcriber().transcribe(to_whisper_pcm(samples, fs))
+    return result.text, result.language
+
+
+def stream_transcription(samples, fs=WHISPER_SAMPLE_RATE):
+    """Yield the transcript segment by segment, as faster-whisper decodes in-memory PCM samples"""
+    for text in get_transcriber().stream(to_whisper_pcm(samples, fs)):
+        yield text.strip()
+
+
 def transcribe_audio(audio_path):
     """
     Transcribe the audio file using faster-whisper and return the text.
+    The model stays loaded in the process-wide engine (see transcription.py).
     """
-    model = WhisperModel(model_size_or_path="base", device="cpu", compute_type="int8")
-    segments, info = model.transcribe(audio_path, beam_size=2)
-    
-    transcription = " ".join([segment.text for segment in segments])
-    return transcription, info.language
+    result = get_transcriber().transcribe(audio_path)
+    return result.text, result.language
+
+
+def wav_bytes(samples, fs):
+    """Encode float samples as an in-memory 16-bit WAV, ready for st.audio"""
+    buffer = io.BytesIO()
+    wav.write(buffer, fs, float_to_int16(samples))
+    return buffer.getvalue()
+
 
-tts = TTS(model_name="tts_models/multilingual/multi-dataset/your_tts", progress_bar=False, gpu=False)
+TTS_MODEL_NAME = "tts_models/multilingual/multi-dataset/your_tts"
+TTS_LANGUAGE = "en"
+TTS_CACHE_MAX_MB = 512
+
+tts = TTS(model_name=TTS_MODEL_NAME, progress_bar=False, gpu=False)
 available_speakers = tts.speakers
 default_speaker = available_speakers[0]  # Just pick the first one (or choose based on preference)
+speech_cache = TTSCache(max_bytes=TTS_CACHE_MAX_MB * 2**20)
+
+
+def _synthesize_wav(text, speaker, language):
+    samples = np.asarray(tts.tts(text=text, speaker=speaker, language=language), dtype=np.float32)
+    # Peak-normalized, as Coqui's own save_wav does
+    samples = samples / max(0.01, float(np.abs(samples).max(initial=0.0)))
+    return wav_bytes(samples, tts.synthesizer.output_sample_rate)
+
+
+def speech_key_for(text, speaker=None, language=TTS_LANGUAGE):
+    return speech_key(text, speaker or default_speaker, language, TTS_MODEL_NAME)
+
+
+def synthesize_speech_bytes(text, speaker=None, language=TTS_LANGUAGE):
+    """
+    WAV bytes of `text`, synthesized with Coqui TTS on the first request and served from the
+    speech cache (memory, then disk) afterwards.
+    """
+    speaker = speaker or default_speaker
+    return speech_cache.get_or_synthesize(
+        speech_key_for(text, speaker, language),
+        lambda: _synthesize_wav(text, speaker, language),
+    )
+
+
+_presynthesized = set()
+
+
+def presynthesize(texts, background=True):
+    """Cache the speech of fixed bot messages ahead of time; texts already handed in are skipped"""
+    texts = [text for text in texts if text not in _presynthesized]
+    _presynthesized.update(texts)
+    if not texts:
+        return
+    warm = lambda: speech_cache.warm(  # noqa: E731
+        (speech_key_for(text), lambda text=text: _synthesize_wav(text, default_speaker, TTS_LANGUAGE))
+        for text in texts
+    )
+    if background:
+        threading.Thread(target=warm, name="tts-presynthesize", daemon=True).start()
+    else:
+        warm()
+
 
 def synthesize_speech(text, output_path=None):
     """
     Synthesize speech from text using Coqui TTS and save it to a WAV file.
-    Returns the file path.
+    Returns the file path; without `output_path` that is a temp file the caller owns (and may
+    delete), filled from the speech cache.
     """
-    print("Synthesizing speech...")
-
+    audio = synthesize_speech_bytes(text)
     if output_path is None:
         output_path = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
-
-    # Synthesize and save
-    tts.tts_to_file(text=text, speaker=default_speaker, language="en", file_path=output_path)
-
-    print(f"Speech saved to {output_path}")
+    with open(output_path, "wb") as f:
+        f.write(audio)
     return output_path
@@ -0,0 +1,61 @@
+# benchmarks/bench_bm25.py
+"""
+Latency of the lexical side of hybrid retrieval.
+Queries are questions sampled from the corpus (CSV, or the Parquet/Arrow file the index is
+built from); reports per-query latency percentiles.
+
+    python benchmarks/bench_bm25.py --index indexes/medical_qa_bge_large_en_bm25
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bm25_index import BM25Index, build_index  # noqa: E402
+from ingestion.corpus import chunk_columns, read_corpus  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BM25 query latency")
+    parser.add_argument("--csv", default="combined_medical_QAs.csv", help="Corpus CSV, Parquet or Arrow file")
+    parser.add_argument("--index", default="indexes/medical_qa_bge_large_en_bm25")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index and report build time")
+    args = parser.parse_args()
+
+    if args.rebuild or not os.path.isdir(args.index):
+        start = time.perf_counter()
+        build_index(args.csv, args.index, collection_name="medical_qa_bge_large_en")
+        print(f"Index build: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    index = BM25Index(args.index)
+    print(f"Index load: {(time.perf_counter() - start) * 1000:.1f}ms "
+          f"({index.n_docs} docs, {len(index.vocab)} terms)")
+
+    questions = [question for chunk in read_corpus(args.csv, 10000) for question in chunk_columns(chunk)[0]]
+    rng = np.random.default_rng(0)
+    queries = [questions[i] for i in rng.choice(len(questions), size=min(args.queries, len(questions)), replace=False)]
+
+    for query in queries[:10]:  # warm the page cache
+        index.search(query, k=args.k)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k=args.k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies = np.asarray(latencies)
+    print(f"{len(latencies)} queries, k={args.k}")
+    print(f"mean {latencies.mean():.3f}ms  p50 {np.percentile(latencies, 50):.3f}ms  "
+          f"p95 {np.percentile(latencies, 95):.3f}ms  p99 {np.percentile(latencies, 99):.3f}ms  "
+          f"max {latencies.max():.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# benchmarks/bench_collection_profiles.py
+"""
+RAM footprint and query latency of each collection profile (ingestion/profiles.py).
+
+The points of an existing collection are copied (vectors included, so nothing is re-embedded)
+into one temporary collection per profile on a local Qdrant. For each profile the report gives
+the load + indexing time, the memory Qdrant reports before and after the load, an estimate of
+the RAM the profile needs, the query latency percentiles and the recall@k against exact search.
+
+    python benchmarks/bench_collection_profiles.py --source medical_qa_bge_large_en
+    python benchmarks/bench_collection_profiles.py --profiles default,balanced,binary --queries 500
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import urllib.request
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingestion.profiles import PROFILES, create_collection, finish_bulk_load  # noqa: E402
+
+
+def qdrant_memory_bytes(url: str):
+    """Memory allocated by the Qdrant process, from its Prometheus endpoint (None if unavailable)"""
+    try:
+        with urllib.request.urlopen(url.rstrip("/") + "/metrics", timeout=5) as response:
+            text = response.read().decode("utf-8")
+    except OSError:
+        return None
+    for metric in ("memory_allocated_bytes", "memory_resident_bytes"):
+        match = re.search(rf"^{metric} (\S+)$", text, re.MULTILINE)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def estimated_ram_bytes(profile, n: int, dim: int, payload_bytes: int) -> float:
+    """Vectors, quantized copy, HNSW links (2 * m per point on layer 0) and payload kept in RAM"""
+    m = profile.hnsw_m or 16
+    ram = 0 if profile.on_disk_vectors else n * dim * 4
+    if profile.quantization == "int8" and profile.quantization_always_ram:
+        ram += n * dim
+    elif profile.quantization == "binary" and profile.quantization_always_ram:
+        ram += n * dim / 8
+    ram += n * m * 2 * 4
+    if not profile.on_disk_payload:
+        ram += payload_bytes
+    return ram
+
+
+def load_source(client: QdrantClient, collection: str, vector_name):
+    points = []
+    offset = None
+    while True:
+        batch, offset = client.scroll(collection, limit=1000, offset=offset, with_payload=True, with_vectors=True)
+        points.extend(batch)
+        if offset is None:
+            break
+    vectors = np.asarray([p.vector[vector_name] if vector_name else p.vector for p in points], dtype=np.float32)
+    return points, vectors
+
+
+def wait_until_indexed(client: QdrantClient, collection: str, timeout: float = 3600.0):
+    start = time.time()
+    while time.time() - start < timeout:
+        # Green once the optimizers (including the deferred HNSW build) are done
+        if client.get_collection(collection).status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Qdrant collection profiles")
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--source", default="medical_qa_bge_large_en", help="Collection whose points are copied")
+    parser.add_argument("--vector-name", help="Named vector to copy from a multi-model collection")
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--payload-schema", choices=["langchain", "flat"], default="langchain")
+    parser.add_argument("--distance", default="Cosine")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--keep", action="store_true", help="Keep the profile collections afterwards")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.url, timeout=300)
+    points, vectors = load_source(client, args.source, args.vector_name)
+    n, dim = vectors.shape
+    payload_bytes = sum(len(str(p.payload)) for p in points)
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(n, size=min(args.queries, n), replace=False)]
+    print(f"{args.source}: {n} points, {dim} dims; {len(queries)} queries, k={args.k}")
+
+    rows = []
+    for name in args.profiles.split(","):
+        profile = PROFILES[name]
+        target = f"{args.source}__{name}"
+        if client.collection_exists(target):
+            client.delete_collection(target)
+        memory_before = qdrant_memory_bytes(args.url)
+
+        start = time.perf_counter()
+        create_collection(client, target, dim, args.distance, profile)
+        for i in range(0, n, args.batch_size):
+            client.upsert(target, points=[
+                models.PointStruct(id=p.id, vector=vectors[i + j].tolist(), payload=p.payload)
+                for j, p in enumerate(points[i:i + args.batch_size])
+            ], wait=True)
+        finish_bulk_load(client, target, args.payload_schema, profile)
+        wait_until_indexed(client, target)
+        load_seconds = time.perf_counter() - start
+        memory_after = qdrant_memory_bytes(args.url)
+
+        params = profile.search_params()
+        exact = models.SearchParams(exact=True)
+        for query in queries[:10]:  # warm up
+            client.query_points(target, query=query.tolist(), limit=args.k, search_params=params)
+        latencies = []
+        recalls = []
+        for query in queries:
+            start = time.perf_counter()
+            found = client.query_points(target, query=query.tolist(), limit=args.k, search_params=params).points
+            latencies.append((time.perf_counter() - start) * 1000)
+            truth = client.query_points(target, query=query.tolist(), limit=args.k, search_params=exact).points
+            recalls.append(len({p.id for p in found} & {p.id for p in truth}) / max(len(truth), 1))
+
+        measured = None if memory_before is None or memory_after is None else memory_after - memory_before
+        rows.append((name, load_seconds, estimated_ram_bytes(profile, n, dim, payload_bytes), measured,
+                     np.percentile(latencies, 50), np.percentile(latencies, 95), np.mean(recalls)))
+        if not args.keep:
+            client.delete_collection(target)
+
+    print(f"{'profile':<12} {'load+index':>10} {'est. RAM':>10} {'measured':>10} {'p50':>8} {'p95':>8} {'recall':>7}")
+    for name, load_seconds, estimate, measured, p50, p95, recall in rows:
+        measured_text = f"{measured / 2**20:8.0f}MB" if measured is not None else f"{'n/a':>10}"
+        print(f"{name:<12} {load_seconds:9.1f}s {estimate / 2**20:8.0f}MB {measured_text} "
+              f"{p50:6.2f}ms {p95:6.2f}ms {recall:7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_embedding_batches.py
+"""
+Padding waste and throughput of the ingestion embedding batches.
+Compares batches cut in CSV order with length-bucketed batches over windows of rows; padding
+is measured with the model's tokenizer, throughput (with --encode) with the model itself.
+
+    python benchmarks/bench_embedding_batches.py --preset bge_large_en
+    python benchmarks/bench_embedding_batches.py --preset bge_large_en --encode --rows 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingestion.config import PRESETS  # noqa: E402
+from ingestion.stages import length_buckets  # noqa: E402
+
+
+def csv_order_batches(n: int, batch_size: int):
+    return [list(range(i, min(i + batch_size, n))) for i in range(0, n, batch_size)]
+
+
+def bucketed_batches(lengths, batch_size: int, window: int):
+    batches = []
+    for start in range(0, len(lengths), window):
+        for bucket in length_buckets(lengths[start:start + window], batch_size):
+            batches.append([start + i for i in bucket])
+    return batches
+
+
+def padding_ratio(lengths, batches) -> float:
+    """Share of the token slots in all batches that are padding"""
+    slots = sum(max(lengths[i] for i in batch) * len(batch) for batch in batches)
+    return 1.0 - sum(lengths) / slots if slots else 0.0
+
+
+def encode_throughput(model, texts, batches, normalize: bool) -> float:
+    start = time.perf_counter()
+    for batch in batches:
+        model.encode([texts[i] for i in batch], batch_size=len(batch), normalize_embeddings=normalize)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark padding and throughput of embedding batches")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="bge_large_en")
+    parser.add_argument("--csv", default="combined_medical_QAs.csv")
+    parser.add_argument("--rows", type=int, help="Only use the first N rows")
+    parser.add_argument("--batch-size", type=int, help="Default: the preset's batch size")
+    parser.add_argument("--windows", default="100,1000,10000", help="Bucketing windows to compare (rows)")
+    parser.add_argument("--encode", action="store_true", help="Also run the model and report rows/s")
+    args = parser.parse_args()
+
+    config = PRESETS[args.preset]
+    batch_size = args.batch_size or config.batch_size
+    texts = pd.read_csv(args.csv, usecols=["question"], nrows=args.rows)["question"].astype(str)
+    texts = [config.text_prefix + text for text in texts]
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(config.model_name, device="cpu")
+    lengths = [len(ids) for ids in model.tokenizer(texts, truncation=True, max_length=model.max_seq_length)["input_ids"]]
+    print(f"{len(texts)} texts, {config.model_name}, batch size {batch_size}, "
+          f"mean {sum(lengths) / len(lengths):.1f} tokens, max {max(lengths)}")
+
+    # sentence-transformers already sorts each encode() call by character length, so the
+    # per-chunk row is what the ingestion did before: one call per CSV chunk
+    strategies = [("csv order", csv_order_batches(len(texts), batch_size))]
+    for window in (int(w) for w in args.windows.split(",")):
+        name = "per chunk (before)" if window == config.chunk_size else f"bucketed, window {window}"
+        strategies.append((name, bucketed_batches(lengths, batch_size, window)))
+
+    for name, batches in strategies:
+        line = f"{name:<26} padding {padding_ratio(lengths, batches):6.1%}"
+        if args.encode:
+            line += f"  {encode_throughput(model, texts, batches, config.normalize):8.1f} rows/s"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# bm25_index.py
+"""
+Lexical BM25 index over the medical QA corpus, fused with the dense Qdrant results.
+
+The index directory holds
+    vocab.json     term -> term id
+    indptr.npy     int64 posting list boundaries per term (n_terms + 1 entries)
+    postings.npy   int32 document rows, grouped by term
+    impacts.npy    float32 precomputed BM25 weight of each posting (idf included)
+    payloads.bin / offsets.npy   question/answer/tags records (see mmap_index.py)
+    meta.json      corpus statistics and the collection generation the index was built against
+Querying is a handful of array slices and one bincount, so it stays in the millisecond range.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from answer_cache import read_collection_generation
+from ingestion.corpus import chunk_columns, read_corpus
+from ingestion.dedup import DedupPlan
+from ingestion.state import content_point_id
+from mmap_index import META_FILE, PayloadStore, PayloadWriter
+
+logger = logging.getLogger(__name__)
+
+VOCAB_FILE = "vocab.json"
+INDPTR_FILE = "indptr.npy"
+POSTINGS_FILE = "postings.npy"
+IMPACTS_FILE = "impacts.npy"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i if in into is it its my of on or
+should so that the their there these they this to was what when where which who why
+will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+def build_index(csv_file: str, out_dir: str, collection_name: str,
+                chunk_size: int = 1000, k1: float = 1.2, b: float = 0.75, id_scheme: str = "content",
+                dedup_threshold: Optional[float] = None):
+    """
+    Build the BM25 index from the same corpus file (CSV, Parquet or Arrow) the ingestion CLI ingests.
+    Document rows follow corpus order; each carries the Qdrant point id of the same `id_scheme`.
+    Pass the ingestion's `dedup_threshold` when the collection was built with --dedup.
+    """
+    tmp_dir = out_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    payloads = PayloadWriter(tmp_dir)
+    vocab: Dict[str, int] = {}
+    term_postings = defaultdict(list)  # term id -> [(row, tf)]
+    doc_lengths = []
+
+    chunks = read_corpus(csv_file, chunk_size)
+    if dedup_threshold is not None:
+        plan = DedupPlan.build(chunks, dedup_threshold)
+        chunks = plan.apply(read_corpus(csv_file, chunk_size))
+    elif id_scheme == "content":
+        # One document per content id, with merged tags, as the ingestion pipeline indexes them
+        chunks = DedupPlan.build_exact(chunks).apply(read_corpus(csv_file, chunk_size))
+
+    row = 0
+    for chunk in chunks:
+        for question, answer, row_tags in zip(*chunk_columns(chunk)):
+            tags = row_tags if isinstance(row_tags, list) else [tag.strip() for tag in str(row_tags).split(",")]
+            tokens = tokenize(f"{question} {answer} {' '.join(tags)}")
+            for term, tf in Counter(tokens).items():
+                term_id = vocab.setdefault(term, len(vocab))
+                term_postings[term_id].append((row, tf))
+            doc_lengths.append(len(tokens))
+            point_id = content_point_id(question, answer) if id_scheme == "content" else row
+            payloads.write({"id": point_id, "question": question, "answer": answer, "tags": tags})
+            row += 1
+    payloads.close()
+
+    n_docs = row
+    lengths = np.asarray(doc_lengths, dtype=np.float32)
+    avg_length = float(lengths.mean()) if n_docs else 0.0
+    length_norm = k1 * (1 - b + b * lengths / (avg_length or 1.0))
+
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    for term_id in range(len(vocab)):
+        indptr[term_id + 1] = indptr[term_id] + len(term_postings[term_id])
+    postings = np.empty(indptr[-1], dtype=np.int32)
+    impacts = np.empty(indptr[-1], dtype=np.float32)
+    for term_id in range(len(vocab)):
+        rows, tfs = zip(*term_postings.pop(term_id))
+        rows = np.asarray(rows, dtype=np.int32)
+        tfs = np.asarray(tfs, dtype=np.float32)
+        df = len(rows)
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        start, end = indptr[term_id], indptr[term_id + 1]
+        postings[start:end] = rows
+        impacts[start:end] = idf * tfs * (k1 + 1) / (tfs + length_norm[rows])
+
+    np.save(os.path.join(tmp_dir, INDPTR_FILE), indptr)
+    np.save(os.path.join(tmp_dir, POSTINGS_FILE), postings)
+    np.save(os.path.join(tmp_dir, IMPACTS_FILE), impacts)
+    with open(os.path.join(tmp_dir, VOCAB_FILE), "w") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+        json.dump({"collection_name": collection_name, "n_docs": n_docs, "n_terms": len(vocab),
+                   "avg_length": avg_length, "k1": k1, "b": b,
+                   "generation": read_collection_generation(collection_name)}, f)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    logger.info(f"BM25 index over {n_docs} documents ({len(vocab)} terms) written to {out_dir}")
+
+
+class BM25Index:
+    """
+    Memory-mapped BM25 index built by build_index. Once the collection is changed (a --diff or
+    resumed ingestion run marks it rebuilt) the index no longer matches it: `is_current` turns
+    False until the index is rebuilt, so deleted or corrected answers are not served from it.
+    """
+
+    def __init__(self, index_dir: str, generation_check_interval: float = 5.0):
+        with open(os.path.join(index_dir, META_FILE)) as f:
+            self.meta = json.load(f)
+        with open(os.path.join(index_dir, VOCAB_FILE)) as f:
+            self.vocab = json.load(f)
+        self.indptr = np.load(os.path.join(index_dir, INDPTR_FILE), mmap_mode="r")
+        self.postings = np.load(os.path.join(index_dir, POSTINGS_FILE), mmap_mode="r")
+        self.impacts = np.load(os.path.join(index_dir, IMPACTS_FILE), mmap_mode="r")
+        self.payloads = PayloadStore(index_dir, self.meta["collection_name"])
+        self.n_docs = self.meta["n_docs"]
+        self.generation_check_interval = generation_check_interval
+        self._current = None
+        self._generation_checked_at = 0.0
+
+    def is_current(self) -> bool:
+        """True while the collection has not changed since the index was built"""
+        now = time.monotonic()
+        if self._current is None or now - self._generation_checked_at >= self.generation_check_interval:
+            self._generation_checked_at = now
+            current = self.meta.get("generation", "") == read_collection_generation(self.meta["collection_name"])
+            if not current and self._current is not False:
+                logger.warning(f"BM25 index of {self.meta['collection_name']} is older than the collection; "
+                               f"hybrid retrieval is off until it is rebuilt with bm25_index.py")
+            self._current = current
+        return self._current
+
+    def search_rows(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (row, score) pairs for a query"""
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids:
+            return []
+        slices = [slice(self.indptr[t], self.indptr[t + 1]) for t in term_ids]
+        rows = np.concatenate([self.postings[s] for s in slices])
+        impacts = np.concatenate([self.impacts[s] for s in slices])
+
+        scores = np.bincount(rows, weights=impacts, minlength=self.n_docs)
+
+        k = min(k, self.n_docs)  # more postings than documents when several terms match
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top if scores[row] > 0]
+
+    def search(self, query: str, k: int = 5, min_score: float = 0.0) -> List[Tuple[Document, float]]:
+        return [
+            (self.payloads.document(row), score)
+            for row, score in self.search_rows(query, k)
+            if score >= min_score
+        ]
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[Sequence[Document]], limit: int,
+                           rrf_k: int = 60) -> List[Document]:
+    """Merge ranked document lists by summing 1 / (rrf_k + rank), keyed on the point id"""
+    scores = defaultdict(float)
+    docs = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            doc_id = doc.metadata.get("_id")
+            scores[doc_id] += 1.0 / (rrf_k + rank + 1)
+            docs.setdefault(doc_id, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [docs[doc_id] for doc_id in ranked[:limit]]
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build the BM25 index over the medical QA CSV")
+    parser.add_argument("--csv", default="combined_medical_QAs.csv", help="Corpus CSV, Parquet or Arrow file")
+    parser.add_argument("--collection", default="medical_qa_bge_large_en",
+                        help="Qdrant collection whose point ids the index rows match")
+    parser.add_argument("--out", help="Output directory (default: indexes/<collection>_bm25)")
+    parser.add_argument("--id-scheme", choices=["content", "row"], default="content",
+                        help="Point id scheme the collection was ingested with")
+    parser.add_argument("--dedup-threshold", type=float,
+                        help="Drop near-duplicates like `python -m ingestion --dedup` did")
+    args = parser.parse_args()
+    build_index(args.csv, args.out or os.path.join("indexes", f"{args.collection}_bm25"), args.collection,
+                id_scheme=args.id_scheme, dedup_threshold=args.dedup_threshold)
+
+
+if __name__ == "__main__":
+    main()
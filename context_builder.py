@@ -0,0 +1,107 @@
+# context_builder.py
+import re
+from typing import List, Optional, Tuple
+
+WORD_PATTERN = re.compile(r"\w+")
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def approx_token_count(text: str) -> int:
+    """Fast estimate of llama3 tokens: words split into ~1.3 pieces, punctuation counted separately"""
+    words = 0
+    symbols = 0
+    for token in TOKEN_PATTERN.findall(text):
+        if token[0].isalnum() or token[0] == "_":
+            words += 1
+        else:
+            symbols += 1
+    return int(words * 1.3 + symbols + 0.5)
+
+
+def format_snippet(question: str, answer: str) -> str:
+    return f"- Q: {question}\n  A: {answer}"
+
+
+class ContextBuilder:
+    """
+    Assembles the context snippets for the RAG prompt.
+    Near-duplicate Q&A pairs are dropped and the snippets are kept within a token budget,
+    filling it with the higher-ranked documents first.
+    """
+
+    def __init__(self, token_budget: int = 1200, dedup_threshold: float = 0.8,
+                 min_truncated_tokens: int = 48, tokenizer_name: Optional[str] = None):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.min_truncated_tokens = min_truncated_tokens
+        self._tokenizer = None
+        if tokenizer_name:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+
+    def count_tokens(self, text: str) -> int:
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False))
+        return approx_token_count(text)
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Cut `text` at a word boundary so it fits in `max_tokens`"""
+        words = text.split()
+        low, high = 0, len(words)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.count_tokens(" ".join(words[:mid]) + " ...") <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return " ".join(words[:low]) + " ..." if low else ""
+
+    @staticmethod
+    def _word_set(doc) -> frozenset:
+        text = f"{doc.page_content} {doc.metadata.get('answer', '')}".lower()
+        return frozenset(WORD_PATTERN.findall(text))
+
+    def _is_near_duplicate(self, words: frozenset, kept: List[frozenset]) -> bool:
+        for other in kept:
+            union = len(words | other)
+            if union and len(words & other) / union >= self.dedup_threshold:
+                return True
+        return False
+
+    def build(self, docs) -> Tuple[str, list]:
+        """
+        Return the context string and the documents it was built from.
+        `docs` must be ordered from most to least relevant. The context is only empty when not
+        even the first document's question fits in the budget.
+        """
+        snippets = []
+        kept_docs = []
+        kept_words: List[frozenset] = []
+        remaining = self.token_budget
+        separator_tokens = self.count_tokens("\n\n")
+
+        for doc in docs:
+            words = self._word_set(doc)
+            if self._is_near_duplicate(words, kept_words):
+                continue
+            cost = separator_tokens if snippets else 0
+            answer = str(doc.metadata.get("answer", ""))
+            snippet = format_snippet(doc.page_content, answer)
+            tokens = self.count_tokens(snippet)
+            if cost + tokens > remaining:
+                # Only the answer is shortened, and only if enough of it survives to be useful;
+                # the best-ranked document is always kept, however short its answer gets
+                header_tokens = self.count_tokens(format_snippet(doc.page_content, ""))
+                answer_budget = remaining - cost - header_tokens
+                if answer_budget < (self.min_truncated_tokens if snippets else 1):
+                    break
+                snippet = format_snippet(doc.page_content, self._truncate(answer, answer_budget))
+                tokens = self.count_tokens(snippet)
+            snippets.append(snippet)
+            kept_docs.append(doc)
+            kept_words.append(words)
+            remaining -= cost + tokens
+            if remaining <= 0:
+                break
+
+        return "\n\n".join(snippets), kept_docs
@@ -0,0 +1,87 @@
+# ingestion/__main__.py
+"""
+Build a Qdrant collection from the medical QA CSV.
+
+    python -m ingestion --preset bge_large_en
+    python -m ingestion --model BAAI/bge-large-en --collection my_collection --vector-size 1024 \
+        --payload-schema flat --url http://localhost:6333
+"""
+import argparse
+import logging
+from dataclasses import replace
+
+from ingestion.config import PRESETS, IngestConfig, preset_vector
+from ingestion.pipeline import run_ingestion
+from ingestion.profiles import PROFILES
+
+
+def parse_args(argv=None) -> IngestConfig:
+    parser = argparse.ArgumentParser(prog="python -m ingestion", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="Start from the settings of a former build script")
+    parser.add_argument("--csv", dest="csv_file", help="Corpus CSV, or a Parquet/Arrow file from `python -m ingestion.corpus`")
+    parser.add_argument("--collection", dest="collection_name")
+    parser.add_argument("--model", dest="model_name")
+    parser.add_argument("--vector-size", type=int)
+    parser.add_argument("--distance", choices=["Cosine", "Dot", "Euclid", "Manhattan"])
+    parser.add_argument("--chunk-size", type=int, help="CSV rows per chunk")
+    parser.add_argument("--batch-size", type=int, help="Embedding batch size")
+    parser.add_argument("--normalize", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--text-prefix", help="Instruction prepended to every embedded text")
+    parser.add_argument("--payload-schema", choices=["langchain", "flat"])
+    parser.add_argument("--tags-format", choices=["list", "string"])
+    parser.add_argument("--url", help="Qdrant URL")
+    parser.add_argument("--api-key")
+    parser.add_argument("--device")
+    parser.add_argument("--mode", choices=["pipelined", "sequential"])
+    parser.add_argument("--queue-size", type=int, help="Chunks buffered between pipeline stages")
+    parser.add_argument("--upsert-workers", type=int)
+    parser.add_argument("--confirm-every", type=int,
+                        help="Chunks upserted without waiting before they are confirmed and checkpointed")
+    parser.add_argument("--embed-workers", type=int, help="Embedding processes (0 embeds in the main process)")
+    parser.add_argument("--threads-per-worker", type=int)
+    parser.add_argument("--id-scheme", choices=["content", "row"])
+    parser.add_argument("--state-dir", help="Where checkpoints and manifests are kept")
+    parser.add_argument("--resume", action=argparse.BooleanOptionalAction, default=None,
+                        help="Skip chunks finished by an interrupted run (default: on)")
+    parser.add_argument("--diff", action="store_true", default=None,
+                        help="Only embed new or changed rows and delete rows removed from the CSV")
+    parser.add_argument("--embedding-cache-dir", help="Where embeddings are cached across runs")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Always run the model")
+    parser.add_argument("--embedding-cache-max-gb", type=float,
+                        help="Evict least recently used embeddings beyond this size")
+    parser.add_argument("--length-bucketing", action=argparse.BooleanOptionalAction, default=None,
+                        help="Embed batches of similar token length (default: on)")
+    parser.add_argument("--bucket-window", type=int, help="Rows sorted together into length buckets")
+    parser.add_argument("--dedup", action="store_true", default=None,
+                        help="Drop near-duplicate QA pairs, merging their tags (report in --state-dir)")
+    parser.add_argument("--dedup-threshold", type=float, help="Similarity above which rows are duplicates")
+    parser.add_argument("--named-vectors",
+                        help="Comma-separated presets whose models are all embedded into one collection, "
+                             "each as a named vector (e.g. bge_large_en,bge_m3,multilingual_e5_base)")
+    parser.add_argument("--profile", choices=sorted(PROFILES),
+                        help="HNSW / quantization / on-disk settings of a new collection")
+    parser.add_argument("--upload-parallel", type=int, help="Upsert batches sent concurrently")
+    parser.add_argument("--upload-batch-mb", type=float, help="Starting upsert batch size in MB of JSON")
+    parser.add_argument("--upload-retries", type=int, help="Retries of a transient Qdrant error")
+    parser.add_argument("--upload-backoff", type=float, help="Seconds before the first retry (doubled each time)")
+    parser.add_argument("--recreate", action="store_true", default=None, help="Drop the collection first")
+    args = parser.parse_args(argv)
+
+    base = PRESETS[args.preset] if args.preset else IngestConfig()
+    config = base.with_overrides(**vars(args))
+    if args.named_vectors:
+        config = replace(config, named_vectors=tuple(
+            preset_vector(name.strip()) for name in args.named_vectors.split(",")
+        ))
+    if args.no_embedding_cache:
+        config = replace(config, embedding_cache_dir=None)
+    return config
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    run_ingestion(parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
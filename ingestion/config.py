@@ -0,0 +1,139 @@
+# ingestion/config.py
+import os
+from dataclasses import dataclass, fields, replace
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()  # load env variables from .env file
+
+QUERY_PREFIX_BGE = "Represent this sentence for searching relevant passages: "
+
+
+@dataclass(frozen=True)
+class VectorModel:
+    """One embedding model of a multi-model collection, stored as the named vector `name`"""
+    name: str
+    model_name: str
+    vector_size: Optional[int] = None
+    normalize: bool = True
+    text_prefix: str = ""
+    batch_size: int = 8
+
+
+@dataclass
+class IngestConfig:
+    """Everything that differs between ingestion runs"""
+    csv_file: str = "combined_medical_QAs.csv"
+    collection_name: str = "medical_qa_bge_large_en"
+    model_name: str = "BAAI/bge-large-en"
+    vector_size: Optional[int] = None  # None: probe the model
+    distance: str = "Cosine"
+    chunk_size: int = 100
+    batch_size: int = 8
+    normalize: bool = True
+    text_prefix: str = ""
+    payload_schema: str = "langchain"  # "langchain" (page_content/metadata) or "flat"
+    tags_format: str = "list"  # "list" or "string" (comma-joined, as in the CSV)
+    url: str = "http://localhost:6333"
+    api_key: Optional[str] = None
+    timeout: int = 60
+    device: str = "cpu"
+    recreate: bool = False
+    mode: str = "pipelined"  # "pipelined" (concurrent stages) or "sequential"
+    queue_size: int = 4  # chunks buffered between stages
+    upsert_workers: int = 2
+    confirm_every: int = 20  # chunks upserted without waiting before a waiting write confirms and checkpoints them
+    embed_workers: int = 0  # embedding processes; 0 embeds in the main process
+    threads_per_worker: Optional[int] = None  # None: CPU count / embed_workers
+    id_scheme: str = "content"  # "content" (hash of question/answer) or "row" (CSV position)
+    state_dir: str = ".ingest_state"
+    resume: bool = True  # skip chunks recorded in the checkpoint of an interrupted run
+    diff: bool = False  # only embed new/changed rows and delete rows removed from the CSV
+    embedding_cache_dir: Optional[str] = os.path.join(".medimind_cache", "embeddings")  # None disables it
+    embedding_cache_max_gb: Optional[float] = None
+    length_bucketing: bool = True  # embed batches of similar token length instead of CSV order
+    bucket_window: int = 1000  # rows pooled (across chunks) before sorting them into length buckets
+    dedup: bool = False  # drop near-duplicate QA pairs before indexing
+    dedup_threshold: float = 0.8  # estimated Jaccard similarity of question+answer word shingles
+    named_vectors: Tuple[VectorModel, ...] = ()  # several models in one collection; overrides model_name
+    profile: Optional[str] = None  # collection performance profile (ingestion.profiles), None: Qdrant defaults
+    upload_parallel: int = 4  # concurrent upsert batches
+    upload_batch_mb: float = 4.0  # starting batch size, adapted to timeouts and 413s
+    upload_retries: int = 5  # retries of a transient Qdrant error, with exponential backoff
+    upload_backoff: float = 0.5  # seconds before the first retry, doubled for each further one
+
+    @property
+    def bucket_batch_size(self) -> Optional[int]:
+        return self.batch_size if self.length_bucketing else None
+
+    def for_vector(self, vector: VectorModel) -> "IngestConfig":
+        """Settings for embedding with one of the named vector models"""
+        return replace(self, model_name=vector.model_name, vector_size=vector.vector_size,
+                       normalize=vector.normalize, text_prefix=vector.text_prefix,
+                       batch_size=vector.batch_size, named_vectors=())
+
+    def with_overrides(self, **overrides) -> "IngestConfig":
+        names = {f.name for f in fields(self)}
+        return replace(self, **{k: v for k, v in overrides.items() if k in names and v is not None})
+
+
+# One preset per former build_qa_vectors_* script
+PRESETS = {
+    "bge_large_en": IngestConfig(
+        collection_name="medical_qa_bge_large_en",
+        model_name="BAAI/bge-large-en",
+        vector_size=1024,
+        batch_size=8,
+        normalize=True,
+        payload_schema="langchain",
+        tags_format="list",
+    ),
+    "bge_large_en_flat": IngestConfig(
+        collection_name="medical_qa_specific",
+        model_name="BAAI/bge-large-en",
+        vector_size=1024,
+        batch_size=8,
+        normalize=True,
+        payload_schema="flat",
+        tags_format="string",
+    ),
+    "multilingual_e5_base": IngestConfig(
+        collection_name="medical_qa_multilingual_e5_base",
+        model_name="intfloat/multilingual-e5-base",
+        vector_size=768,
+        batch_size=32,
+        normalize=False,
+        payload_schema="langchain",
+        tags_format="string",
+    ),
+    "bge_m3": IngestConfig(
+        collection_name="medical_qa",
+        model_name="BAAI/bge-m3",
+        vector_size=1024,
+        batch_size=32,
+        normalize=False,
+        text_prefix=QUERY_PREFIX_BGE,
+        payload_schema="flat",
+        tags_format="string",
+        url=os.getenv("QDRANT_URL") or "http://localhost:6333",
+        api_key=os.getenv("QDRANT_API_KEY"),
+    ),
+}
+
+
+def preset_vector(preset: str) -> VectorModel:
+    """Named vector with the embedding settings of a single-model preset"""
+    config = PRESETS[preset]
+    return VectorModel(name=preset, model_name=config.model_name, vector_size=config.vector_size,
+                       normalize=config.normalize, text_prefix=config.text_prefix,
+                       batch_size=config.batch_size)
+
+
+# The three models compared for retrieval, read from one CSV pass into one collection
+PRESETS["multi_model"] = IngestConfig(
+    collection_name="medical_qa_multi",
+    payload_schema="langchain",
+    tags_format="list",
+    named_vectors=tuple(preset_vector(name) for name in ("bge_large_en", "bge_m3", "multilingual_e5_base")),
+)
@@ -0,0 +1,155 @@
+# ingestion/corpus.py
+"""
+Columnar copy of the QA corpus.
+
+`python -m ingestion.corpus combined_medical_QAs.csv combined_medical_QAs.parquet` converts
+the CSV once into Parquet (or Arrow IPC for a `.arrow` target) with columns
+    question  string
+    answer    string
+    tags      list<string>   split on commas, trimmed, empty tags dropped
+Readers then stream record batches instead of re-parsing the CSV; an Arrow IPC file is
+memory-mapped, so its batches are zero-copy views of the file.
+
+pyarrow is only imported when a columnar file is read or written; CSV corpora keep working
+without it.
+"""
+import argparse
+import logging
+import os
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+COLUMNAR_SUFFIXES = (".parquet", ".arrow", ".feather")
+COLUMNS = ["question", "answer", "tags"]
+
+
+def is_columnar(path: str) -> bool:
+    return path.endswith(COLUMNAR_SUFFIXES)
+
+
+def _normalize_tags(tags):
+    """Comma-joined tag strings -> list<string> without blanks, computed on whole columns"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    split = pc.split_pattern(pc.fill_null(tags.cast(pa.string()), ""), ",")
+    values = pc.utf8_trim_whitespace(split.flatten())
+    keep = pc.not_equal(values, "").to_numpy(zero_copy_only=False)
+    parents = pc.list_parent_indices(split).to_numpy()
+    counts = np.bincount(parents[keep], minlength=len(split))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int32)
+    return pa.ListArray.from_arrays(pa.array(offsets), values.filter(pa.array(keep)))
+
+
+def convert_csv(csv_file: str, out_path: str, block_rows: int = 65536):
+    """Stream the CSV into a columnar file with tag lists"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("question", pa.string()), ("answer", pa.string()), ("tags", pa.list_(pa.string()))])
+    reader = pa_csv.open_csv(
+        csv_file,
+        read_options=pa_csv.ReadOptions(block_size=1 << 24),
+        # Answers may span lines inside quotes, as pandas accepts
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=COLUMNS,
+            column_types={name: pa.string() for name in COLUMNS},
+        ),
+    )
+    tmp_path = out_path + ".tmp"
+    if out_path.endswith(".parquet"):
+        writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+        write = lambda batch: writer.write_batch(batch, row_group_size=block_rows)  # noqa: E731
+    else:
+        writer = pa.ipc.new_file(tmp_path, schema)
+        write = writer.write_batch
+
+    rows = 0
+    for batch in reader:
+        write(pa.RecordBatch.from_arrays([
+            pc.fill_null(batch.column("question"), ""),
+            pc.fill_null(batch.column("answer"), ""),
+            _normalize_tags(batch.column("tags")),
+        ], schema=schema))
+        rows += batch.num_rows
+    writer.close()
+    os.replace(tmp_path, out_path)
+    logger.info(f"Wrote {rows} rows to {out_path}")
+    return rows
+
+
+def _rebatch(batches, batch_size: int):
+    """Cut record batches into `batch_size` rows; slices share the parent's buffers"""
+    for batch in batches:
+        for start in range(0, batch.num_rows, batch_size):
+            yield batch.slice(start, batch_size)
+
+
+def read_batches(path: str, batch_size: int) -> Iterator:
+    """Stream a columnar corpus as pyarrow RecordBatches of `batch_size` rows"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.endswith(".parquet"):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=COLUMNS)
+        return
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        yield from _rebatch((reader.get_batch(i) for i in range(reader.num_record_batches)), batch_size)
+
+
+def read_corpus(path: str, chunk_size: int) -> Iterator:
+    """Chunks of the corpus: pandas DataFrames for a CSV, RecordBatches for a columnar file"""
+    if is_columnar(path):
+        return read_batches(path, chunk_size)
+    return pd.read_csv(path, chunksize=chunk_size)
+
+
+def chunk_columns(chunk) -> Tuple[List[str], List[str], list]:
+    """
+    Questions, answers and tags of a chunk, column by column. Tags are lists for a columnar
+    chunk and the raw comma-joined strings for a CSV chunk.
+    """
+    if isinstance(chunk, pd.DataFrame):
+        return ([str(q) for q in chunk["question"].tolist()], [str(a) for a in chunk["answer"].tolist()],
+                chunk["tags"].tolist())
+    return (chunk.column("question").to_pylist(), chunk.column("answer").to_pylist(),
+            [tags or [] for tags in chunk.column("tags").to_pylist()])
+
+
+def chunk_length(chunk) -> int:
+    return len(chunk) if isinstance(chunk, pd.DataFrame) else chunk.num_rows
+
+
+def select_rows(chunk, keep: List[bool], tags: list):
+    """Chunk with only the `keep` rows and its tag column replaced by `tags` (one entry per row)"""
+    if isinstance(chunk, pd.DataFrame):
+        chunk = chunk.copy()
+        chunk["tags"] = [", ".join(t) if isinstance(t, list) else t for t in tags]
+        return chunk[keep]
+    import pyarrow as pa
+
+    tag_lists = [t if isinstance(t, list) else [] for t in tags]
+    columns = [chunk.column("question"), chunk.column("answer"), pa.array(tag_lists, type=pa.list_(pa.string()))]
+    return pa.RecordBatch.from_arrays(columns, names=COLUMNS).filter(pa.array(keep))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Convert the QA corpus CSV to Parquet or Arrow IPC")
+    parser.add_argument("csv", nargs="?", default="combined_medical_QAs.csv")
+    parser.add_argument("out", nargs="?", default="combined_medical_QAs.parquet",
+                        help="Target file; .parquet for Parquet, .arrow for a memory-mappable Arrow IPC file")
+    args = parser.parse_args()
+    convert_csv(args.csv, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# ingestion/dedup.py
+"""
+Near-duplicate removal for the QA corpus.
+
+Each row is reduced to a MinHash signature of its question/answer word shingles; LSH banding
+finds candidate pairs without comparing every row with every other, and candidates are kept
+only when their estimated Jaccard similarity reaches the threshold.
+
+The first pass streams the corpus chunks (CSV DataFrames or columnar record batches) and only keeps one signature per cluster; the second
+pass (the ingestion reader) drops the duplicates and gives each canonical row (the first of its
+cluster) the union of the cluster's tags.
+
+Exact duplicates (same question and answer, so the same content point id) are merged the same
+way on every content-id run, even without --dedup: otherwise their points overwrite each other
+and their differing tags make every --diff run rewrite the payload.
+"""
+import json
+import logging
+import os
+import re
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ingestion import corpus
+from ingestion.state import content_point_id
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(text: str, size: int = 3) -> np.ndarray:
+    """32-bit hashes of the word `size`-grams of a text"""
+    words = WORD_PATTERN.findall(str(text).lower())
+    if len(words) < size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64))
+
+
+def split_tags(tags) -> List[str]:
+    if isinstance(tags, list):
+        return list(tags)
+    return [tag.strip() for tag in str(tags).split(",") if tag.strip()]
+
+
+class MinHashLSH:
+    """Streaming near-duplicate detector: each added row either joins a cluster or starts one"""
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        rng = np.random.RandomState(seed)
+        # a, b < 2**32 and 32-bit shingles keep a * x + b below 2**64
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)[:, None]
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []  # one per cluster
+
+    def signature(self, shingle_hashes: np.ndarray) -> np.ndarray:
+        hashed = ((self._a * shingle_hashes[None, :] + self._b) % MERSENNE_PRIME) & MAX_HASH
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        r = self.rows_per_band
+        return [signature[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def add(self, text: str) -> Tuple[int, bool]:
+        """Return (cluster id, True if the text started a new cluster)"""
+        signature = self.signature(shingles(text))
+        keys = self._band_keys(signature)
+        candidates = set()
+        for band, key in zip(self._buckets, keys):
+            candidates.update(band.get(key, ()))
+        best, best_similarity = None, self.threshold
+        for cluster in candidates:
+            similarity = float(np.mean(self._signatures[cluster] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = cluster, similarity
+        if best is not None:
+            return best, False
+        cluster = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in zip(self._buckets, keys):
+            band[key].append(cluster)
+        return cluster, True
+
+
+class DedupPlan:
+    """Which corpus rows to drop and the merged tags of every canonical row"""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.rows = 0
+        self.duplicate_of: Dict[int, int] = {}  # duplicate row -> canonical row
+        self.merged_tags: Dict[int, List[str]] = {}  # canonical row -> tags, only for clusters with duplicates
+        self.questions: Dict[int, str] = {}  # question of every row in a cluster, for the report
+
+    @classmethod
+    def build(cls, chunks: Iterable, threshold: float = 0.8) -> "DedupPlan":
+        plan = cls(threshold)
+        lsh = MinHashLSH(threshold)
+        canonical_rows: List[int] = []  # cluster id -> canonical row
+        cluster_tags: List[List[str]] = []
+        cluster_questions: List[str] = []
+        for chunk in chunks:
+            for question, answer, row_tags in zip(*corpus.chunk_columns(chunk)):
+                row = plan.rows
+                plan.rows += 1
+                cluster, is_new = lsh.add(f"{question} {answer}")
+                tags = split_tags(row_tags)
+                if is_new:
+                    canonical_rows.append(row)
+                    cluster_tags.append(tags)
+                    cluster_questions.append(question)
+                    continue
+                canonical = canonical_rows[cluster]
+                plan.duplicate_of[row] = canonical
+                plan.questions[row] = question
+                plan.questions.setdefault(canonical, cluster_questions[cluster])
+                merged = cluster_tags[cluster]
+                merged.extend(tag for tag in tags if tag not in merged)
+                plan.merged_tags[canonical] = merged
+        return plan
+
+    @classmethod
+    def build_exact(cls, chunks: Iterable) -> "DedupPlan":
+        """Plan merging the rows that share a question and answer"""
+        plan = cls(1.0)
+        first: Dict[str, Tuple[int, List[str], str]] = {}  # content id -> canonical row, tags, question
+        for chunk in chunks:
+            for question, answer, row_tags in zip(*corpus.chunk_columns(chunk)):
+                row = plan.rows
+                plan.rows += 1
+                tags = split_tags(row_tags)
+                canonical, merged, canonical_question = first.setdefault(
+                    content_point_id(question, answer), (row, tags, question))
+                if canonical == row:
+                    continue
+                plan.duplicate_of[row] = canonical
+                plan.questions[row] = question
+                plan.questions.setdefault(canonical, canonical_question)
+                merged.extend(tag for tag in tags if tag not in merged)
+                plan.merged_tags[canonical] = merged
+        return plan
+
+    def apply(self, chunks: Iterable) -> Iterator:
+        """Drop the duplicate rows and set the merged tags on canonical rows, chunk by chunk"""
+        row = 0
+        for chunk in chunks:
+            positions = range(row, row + corpus.chunk_length(chunk))
+            row += corpus.chunk_length(chunk)
+            keep = [position not in self.duplicate_of for position in positions]
+            if all(keep) and not any(position in self.merged_tags for position in positions):
+                yield chunk
+                continue
+            tags = [
+                self.merged_tags[position] if position in self.merged_tags else row_tags
+                for position, row_tags in zip(positions, corpus.chunk_columns(chunk)[2])
+            ]
+            chunk = corpus.select_rows(chunk, keep, tags)
+            if corpus.chunk_length(chunk):
+                yield chunk
+
+    def write_report(self, path: str):
+        clusters = defaultdict(list)
+        for row, canonical in self.duplicate_of.items():
+            clusters[canonical].append(row)
+        report = {
+            "threshold": self.threshold,
+            "rows": self.rows,
+            "duplicates_removed": len(self.duplicate_of),
+            "rows_kept": self.rows - len(self.duplicate_of),
+            "clusters": [
+                {
+                    "canonical_row": canonical,
+                    "question": self.questions[canonical],
+                    "tags": self.merged_tags[canonical],
+                    "duplicates": [{"row": row, "question": self.questions[row]} for row in sorted(rows)],
+                }
+                for canonical, rows in sorted(clusters.items(), key=lambda item: -len(item[1]))
+            ],
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def deduplicating_reader(reader: Callable, threshold: float = 0.8,
+                         report_path: Optional[str] = None) -> Callable:
+    """Wrap a chunk reader so that it yields the corpus without near-duplicates"""
+
+    def read(config):
+        plan = DedupPlan.build(reader(config), threshold)
+        logger.info(f"Dedup: {len(plan.duplicate_of)} of {plan.rows} rows are near-duplicates "
+                    f"(threshold {threshold})")
+        if report_path:
+            plan.write_report(report_path)
+            logger.info(f"Dedup report written to {report_path}")
+        return plan.apply(reader(config))
+
+    return read
+
+
+def merging_reader(reader: Callable) -> Callable:
+    """Wrap a chunk reader so that rows with the same question and answer become one row"""
+
+    def read(config):
+        plan = DedupPlan.build_exact(reader(config))
+        if plan.duplicate_of:
+            logger.info(f"Merged {len(plan.duplicate_of)} rows repeating the question and answer of another row")
+        return plan.apply(reader(config))
+
+    return read
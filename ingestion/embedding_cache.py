@@ -0,0 +1,349 @@
+# ingestion/embedding_cache.py
+"""
+Content-addressed embedding store shared by ingestion runs.
+
+Embeddings are keyed by (model name, prefix, normalize flag, text hash). Each
+(model, prefix, normalize) combination gets its own directory under the cache root holding
+    vectors.f32    raw float32 rows, appended to and memory-mapped for lookups
+    keys.bin       16-byte blake2b digest of each row's text, in row order
+    stamps.npy     uint32 run number in which each row was last used (for eviction)
+    meta.json      model, prefix, normalize flag, dimension and the last run number
+Rows are only ever appended; `compact` rewrites a namespace without stale or duplicate rows
+and `enforce_size` evicts the least recently used rows once the cache outgrows its limit.
+
+Several processes may use one namespace (presets sharing a model do): every read and write
+holds an flock on `<namespace>.lock`, next to the directory so that it outlives compaction,
+and picks up the rows other processes appended from the file sizes first.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.bin"
+STAMPS_FILE = "stamps.npy"
+META_FILE = "meta.json"
+LOCK_SUFFIX = ".lock"
+KEY_BYTES = 16
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+def namespace_name(model_name: str, prefix: str, normalize: bool) -> str:
+    slug = model_name.replace("/", "__")
+    digest = hashlib.blake2b(f"{model_name}\x1f{prefix}\x1f{normalize}".encode("utf-8"), digest_size=6).hexdigest()
+    return f"{slug}-{digest}"
+
+
+@contextmanager
+def namespace_lock(path: str, shared: bool = False):
+    """Inter-process lock of the namespace directory `path`"""
+    with open(path + LOCK_SUFFIX, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class EmbeddingCache:
+    """Embeddings of one (model, prefix, normalize) combination, persisted under `root`"""
+
+    def __init__(self, root: str, model_name: str, prefix: str = "", normalize: bool = True,
+                 max_bytes: Optional[int] = None):
+        self.root = root
+        self.model_name = model_name
+        self.prefix = prefix
+        self.normalize = normalize
+        self.max_bytes = max_bytes
+        self.path = os.path.join(root, namespace_name(model_name, prefix, normalize))
+        os.makedirs(self.path, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._lock, namespace_lock(self.path):
+            self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _read_meta(self) -> dict:
+        if not os.path.exists(self._file(META_FILE)):
+            return {}
+        with open(self._file(META_FILE)) as f:
+            return json.load(f)
+
+    def _vector_rows(self) -> Optional[int]:
+        """Rows in vectors.f32, None while the dimension is unknown"""
+        if not self.dim:
+            return None
+        path = self._file(VECTORS_FILE)
+        return os.path.getsize(path) // (self.dim * 4) if os.path.exists(path) else 0
+
+    def _load(self):
+        """Read the namespace from disk; caller holds the namespace lock"""
+        os.makedirs(self.path, exist_ok=True)
+        meta = self._read_meta()
+        self.dim: Optional[int] = meta.get("dim")
+        self.run = meta.get("run", 0) + 1
+
+        keys = b""
+        if os.path.exists(self._file(KEYS_FILE)):
+            with open(self._file(KEYS_FILE), "rb") as f:
+                keys = f.read()
+        n_rows = len(keys) // KEY_BYTES
+        if self.dim:
+            # A run killed mid-append can leave one side longer than the other; trust the shorter one
+            n_rows = min(n_rows, self._vector_rows())
+        self._truncate(n_rows)
+        self._keys_inode = self._inode(KEYS_FILE)
+
+        self._rows = {keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(n_rows)}
+        self.n_rows = n_rows
+        self._stamps = np.zeros(n_rows, dtype=np.uint32)
+        if os.path.exists(self._file(STAMPS_FILE)):
+            stamps = np.load(self._file(STAMPS_FILE))
+            self._stamps[:min(len(stamps), n_rows)] = stamps[:n_rows]
+        self._vectors = None  # memory map, reopened when rows are appended
+        self._mapped_rows = 0
+
+    def _inode(self, name: str) -> Optional[int]:
+        try:
+            return os.stat(self._file(name)).st_ino
+        except FileNotFoundError:
+            return None
+
+    def _sync(self):
+        """
+        Catch up with the other processes using the namespace: index the rows they appended, or
+        reload when they compacted or evicted it. Caller holds both locks.
+        """
+        keys_path = self._file(KEYS_FILE)
+        size = os.path.getsize(keys_path) if os.path.exists(keys_path) else 0
+        if self._inode(KEYS_FILE) != self._keys_inode or size < self.n_rows * KEY_BYTES:
+            run = self.run
+            self._load()
+            self.run = run
+            return
+        if self.dim is None:
+            self.dim = self._read_meta().get("dim")
+        n_rows = size // KEY_BYTES
+        if self.dim:
+            n_rows = min(n_rows, self._vector_rows())
+        if n_rows <= self.n_rows:
+            return
+        with open(keys_path, "rb") as f:
+            f.seek(self.n_rows * KEY_BYTES)
+            keys = f.read((n_rows - self.n_rows) * KEY_BYTES)
+        for i in range(n_rows - self.n_rows):
+            self._rows.setdefault(keys[i * KEY_BYTES:(i + 1) * KEY_BYTES], self.n_rows + i)
+        self._stamps = np.concatenate([self._stamps, np.zeros(n_rows - self.n_rows, dtype=np.uint32)])
+        self.n_rows = n_rows
+
+    def _truncate(self, n_rows: int):
+        if os.path.exists(self._file(KEYS_FILE)):
+            os.truncate(self._file(KEYS_FILE), n_rows * KEY_BYTES)
+        if self.dim and os.path.exists(self._file(VECTORS_FILE)):
+            os.truncate(self._file(VECTORS_FILE), n_rows * self.dim * 4)
+
+    def _matrix(self) -> np.ndarray:
+        if self._vectors is None or self._mapped_rows != self.n_rows:
+            self._vectors = np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode="r",
+                                      shape=(self.n_rows, self.dim))
+            self._mapped_rows = self.n_rows
+        return self._vectors
+
+    def lookup(self, texts: Sequence[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """Return the cached vector (or None) of every text, and the positions of the misses"""
+        with self._lock, namespace_lock(self.path, shared=True):
+            self._sync()
+            rows = [self._rows.get(text_key(text)) for text in texts]
+            found = [row for row in rows if row is not None]
+            vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+            if found:
+                matrix = self._matrix()
+                self._stamps[found] = self.run
+                for i, row in enumerate(rows):
+                    if row is not None:
+                        vectors[i] = np.array(matrix[row])
+            missing = [i for i, row in enumerate(rows) if row is None]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+            return vectors, missing
+
+    def add(self, texts: Sequence[str], vectors):
+        """Append the embeddings of `texts`; texts already cached are skipped"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        with self._lock, namespace_lock(self.path):
+            # Row numbers follow the files, which other processes may have appended to
+            self._sync()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._save_meta()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the cached {self.dim}")
+            new_keys = []
+            new_rows = []
+            for i, text in enumerate(texts):
+                key = text_key(text)
+                if key not in self._rows:
+                    self._rows[key] = self.n_rows + len(new_keys)
+                    new_keys.append(key)
+                    new_rows.append(i)
+            if not new_keys:
+                return
+            # Vectors first: a crash between the two writes leaves keys.bin short, never pointing past the data
+            with open(self._file(VECTORS_FILE), "ab") as f:
+                f.write(np.ascontiguousarray(vectors[new_rows]).tobytes())
+            with open(self._file(KEYS_FILE), "ab") as f:
+                f.write(b"".join(new_keys))
+            self.n_rows += len(new_keys)
+            self._stamps = np.concatenate([self._stamps, np.full(len(new_keys), self.run, dtype=np.uint32)])
+
+    def fill(self, texts: Sequence[str], vectors: list, missing: List[int], computed) -> List[List[float]]:
+        """Store the embeddings computed for the `missing` texts of a lookup and return all of them"""
+        if missing:
+            self.add([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return [v.tolist() if hasattr(v, "tolist") else list(v) for v in vectors]
+
+    def embed(self, texts: Sequence[str], embed_fn: Callable[[List[str]], list]) -> List[List[float]]:
+        """Embed `texts`, calling `embed_fn` only on the texts missing from the cache"""
+        vectors, missing = self.lookup(texts)
+        computed = embed_fn([texts[i] for i in missing]) if missing else []
+        return self.fill(texts, vectors, missing, computed)
+
+    def _save_meta(self):
+        meta = {"model": self.model_name, "prefix": self.prefix, "normalize": self.normalize,
+                "dim": self.dim, "run": self.run}
+        with open(self._file(META_FILE), "w") as f:
+            json.dump(meta, f)
+
+    def nbytes(self) -> int:
+        return self.n_rows * ((self.dim or 0) * 4 + KEY_BYTES + 4)
+
+    def compact(self, keep: Optional[Iterable[str]] = None, max_bytes: Optional[int] = None) -> int:
+        """
+        Rewrite the namespace keeping only the rows of `keep` (all rows when None), most recently
+        used first and at most `max_bytes` of them. Returns the number of rows dropped.
+        """
+        with self._lock, namespace_lock(self.path):
+            self._sync()
+            if not self.n_rows:
+                return 0
+            rows = np.arange(self.n_rows)
+            if keep is not None:
+                wanted = {text_key(text) for text in keep}
+                rows = np.asarray([row for key, row in self._rows.items() if key in wanted], dtype=np.int64)
+            rows = rows[np.argsort(-self._stamps[rows].astype(np.int64), kind="stable")]
+            if max_bytes is not None:
+                rows = rows[:max(max_bytes, 0) // (self.dim * 4 + KEY_BYTES + 4)]
+            rows = np.sort(rows)
+
+            keys = [None] * self.n_rows
+            for key, row in self._rows.items():
+                keys[row] = key
+            matrix = self._matrix()
+            tmp_dir = self.path + ".tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            with open(os.path.join(tmp_dir, VECTORS_FILE), "wb") as f:
+                for start in range(0, len(rows), 8192):
+                    f.write(np.ascontiguousarray(matrix[rows[start:start + 8192]]).tobytes())
+            with open(os.path.join(tmp_dir, KEYS_FILE), "wb") as f:
+                f.write(b"".join(keys[row] for row in rows))
+            np.save(os.path.join(tmp_dir, STAMPS_FILE), self._stamps[rows])
+            shutil.copy(self._file(META_FILE), os.path.join(tmp_dir, META_FILE))
+
+            dropped = self.n_rows - len(rows)
+            self._vectors = None
+            shutil.rmtree(self.path)
+            os.replace(tmp_dir, self.path)
+            run = self.run
+            self._load()
+            self.run = run
+            return dropped
+
+    def close(self):
+        """Persist usage stamps and enforce the size limit across the whole cache root"""
+        with self._lock, namespace_lock(self.path):
+            self._sync()
+            if self.dim is not None:
+                np.save(self._file(STAMPS_FILE), self._stamps)
+                self._save_meta()
+        if self.max_bytes is not None:
+            enforce_size(self.root, self.max_bytes, current=self)
+        if self.hits or self.misses:
+            logger.info(f"Embedding cache: {self.hits} hits, {self.misses} misses ({self.n_rows} rows cached)")
+
+
+def enforce_size(root: str, max_bytes: int, current: Optional[EmbeddingCache] = None):
+    """
+    Keep the cache root under `max_bytes`: whole namespaces not used for the longest time go
+    first, then the least recently used rows of `current`.
+    """
+    namespaces = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.endswith(".tmp") or not os.path.isdir(path):
+            continue
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        meta_path = os.path.join(path, META_FILE)
+        last_used = os.path.getmtime(meta_path if os.path.exists(meta_path) else path)
+        namespaces.append((last_used, size, path))
+    total = sum(size for _, size, _ in namespaces)
+    for _, size, path in sorted(namespaces):
+        if total <= max_bytes:
+            return
+        if current is not None and path == current.path:
+            continue
+        logger.info(f"Evicting embedding cache {os.path.basename(path)} ({size / 2**20:.0f} MiB)")
+        with namespace_lock(path):
+            shutil.rmtree(path, ignore_errors=True)
+        total -= size
+    if total > max_bytes and current is not None:
+        dropped = current.compact(max_bytes=max_bytes - (total - current.nbytes()))
+        logger.info(f"Evicted {dropped} least recently used embeddings")
+
+
+def main():
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Compact the ingestion embedding cache")
+    parser.add_argument("--root", default=os.path.join(".medimind_cache", "embeddings"))
+    parser.add_argument("--max-gb", type=float, help="Evict least recently used embeddings beyond this size")
+    args = parser.parse_args()
+
+    for name in sorted(os.listdir(args.root)):
+        meta_path = os.path.join(args.root, name, META_FILE)
+        if not os.path.exists(meta_path):
+            continue
+        with open(meta_path) as f:
+            meta = json.load(f)
+        cache = EmbeddingCache(args.root, meta["model"], meta["prefix"], meta["normalize"])
+        dropped = cache.compact()
+        cache.close()
+        logger.info(f"{name}: {cache.n_rows} rows, {dropped} dropped")
+    if args.max_gb is not None:
+        enforce_size(args.root, int(args.max_gb * 2**30))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+# ingestion/pipeline.py
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+from tqdm import tqdm
+
+from answer_cache import mark_collection_rebuilt
+from ingestion import dedup, profiles, stages
+from ingestion.config import IngestConfig
+from ingestion.embedding_cache import EmbeddingCache
+from ingestion.state import IngestState, chunk_hash, payload_fingerprint
+from ingestion.stats import StageStats
+from ingestion.uploader import BulkUploader, call_with_retries
+from ingestion.workers import ProcessEmbedder
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # end-of-stream marker passed through the stage queues
+
+
+class IngestPipeline:
+    """
+    CSV -> (near-duplicate removal) -> payloads -> embeddings (one or several models) -> Qdrant.
+    Each stage is a plain callable attribute, so a run can swap in a different reader,
+    payload layout, embedder or writer without touching the loop.
+
+    Finished chunks are checkpointed so an interrupted run resumes where it stopped, and in
+    diff mode only new or changed rows are embedded (see ingestion.state).
+    """
+
+    def __init__(self, config: IngestConfig,
+                 reader: Callable = stages.read_chunks,
+                 payload_builder: Callable = stages.build_payloads,
+                 embedder: Optional[Callable] = None,
+                 writer: Optional[Callable] = None,
+                 payload_writer: Optional[Callable] = None,
+                 deleter: Optional[Callable] = None):
+        self.config = config
+        if config.dedup:
+            reader = dedup.deduplicating_reader(
+                reader, config.dedup_threshold,
+                report_path=os.path.join(config.state_dir, f"{config.collection_name}.dedup.json"),
+            )
+        elif config.id_scheme == "content":
+            # Rows with one content id would overwrite each other's point
+            reader = dedup.merging_reader(reader)
+        self.reader = reader
+        self.payload_builder = payload_builder
+
+        self.embedding_cache = None
+        self.process_embedder = None
+        self._resources = []  # embedding caches and worker pools, closed at the end of run()
+        self._vector_embedders = {}  # named vector -> embedder, for multi-model collections
+        if embedder is None and config.named_vectors:
+            for vector in config.named_vectors:
+                vector_config = config.for_vector(vector)
+                cache = self._open_cache(vector_config)
+                if config.embed_workers > 0:
+                    # Each model gets its own pool, called chunk by chunk
+                    workers = self._open_process_embedder(vector_config)
+                    embed = workers if cache is None else self._cached(cache, workers)
+                else:
+                    embed = self._local_embedder(vector_config, cache)
+                self._vector_embedders[vector.name] = embed
+            embedder = lambda texts: {  # noqa: E731
+                name: embed(texts) for name, embed in self._vector_embedders.items()
+            }
+        elif embedder is None:
+            self.embedding_cache = self._open_cache(config)
+            if config.embed_workers > 0:
+                self.process_embedder = self._open_process_embedder(config)
+                embedder = self.process_embedder
+                if self.embedding_cache is not None:
+                    embedder = self._cached(self.embedding_cache, self.process_embedder)
+            else:
+                embedder = self._local_embedder(config, self.embedding_cache)
+        self.embedder = embedder
+
+        self.qdrant = None
+        self.uploader = None
+        if writer is None:
+            if self._vector_embedders:
+                vector_size = {
+                    vector.name: vector.vector_size or len(self._vector_embedders[vector.name](["probe"])[0])
+                    for vector in config.named_vectors
+                }
+            elif self.process_embedder is not None:
+                vector_size = self.process_embedder.dim
+            else:
+                vector_size = config.vector_size or len(self.embedder(["probe"])[0])
+            qdrant = self.qdrant = stages.initialize_qdrant(config, vector_size)
+            self.uploader = self._open_uploader(config, qdrant)
+            writer = self.uploader.upload
+            retried = lambda fn: call_with_retries(  # noqa: E731
+                fn, config.upload_retries, config.upload_backoff, self.uploader.backoff_max,
+            )
+            if payload_writer is None:
+                payload_writer = lambda updates, wait=True: retried(  # noqa: E731
+                    lambda: stages.overwrite_payloads(qdrant, config.collection_name, updates, wait=wait)
+                )
+            if deleter is None:
+                deleter = lambda ids: retried(  # noqa: E731
+                    lambda: stages.delete_points(qdrant, config.collection_name, ids)
+                )
+        self.writer = writer
+        self.payload_writer = payload_writer
+        self.deleter = deleter
+
+        self.state = IngestState(config, self.qdrant)
+        self._read_complete = False
+
+    def _open_cache(self, config: IngestConfig) -> Optional[EmbeddingCache]:
+        if not config.embedding_cache_dir:
+            return None
+        max_gb = config.embedding_cache_max_gb
+        cache = EmbeddingCache(
+            config.embedding_cache_dir, config.model_name, config.text_prefix, config.normalize,
+            max_bytes=int(max_gb * 2**30) if max_gb is not None else None,
+        )
+        self._resources.append(cache)
+        return cache
+
+    def _open_uploader(self, config: IngestConfig, qdrant) -> BulkUploader:
+        dead_letter_path = os.path.join(config.state_dir, f"{config.collection_name}.dead_letter.jsonl")
+        if config.recreate and os.path.exists(dead_letter_path):
+            os.remove(dead_letter_path)  # its points belonged to the dropped collection
+        uploader = BulkUploader(
+            qdrant, config.collection_name, parallel=config.upload_parallel,
+            batch_bytes=int(config.upload_batch_mb * 2**20), max_retries=config.upload_retries,
+            backoff=config.upload_backoff, dead_letter_path=dead_letter_path,
+        )
+        self._resources.append(uploader)
+        return uploader
+
+    def _open_process_embedder(self, config: IngestConfig) -> ProcessEmbedder:
+        workers = ProcessEmbedder(config, config.embed_workers, config.threads_per_worker,
+                                  max_rows=self._max_window_rows())
+        self._resources.append(workers)
+        return workers
+
+    @staticmethod
+    def _cached(cache: EmbeddingCache, embed: Callable) -> Callable:
+        return lambda texts: cache.embed(texts, embed)
+
+    def _local_embedder(self, config: IngestConfig, cache: Optional[EmbeddingCache]) -> Callable:
+        """Embed in this process; the model is only loaded once a text misses the embedding cache"""
+        model = None
+
+        def embed(texts):
+            nonlocal model
+            if model is None:
+                model = stages.initialize_embeddings(config)
+            return stages.embed_texts(model, texts, config.text_prefix,
+                                      bucket_batch_size=config.bucket_batch_size)
+
+        return embed if cache is None else self._cached(cache, embed)
+
+    def _prepare(self, df_chunk, index: int, offset: int) -> Optional[dict]:
+        """Parse one chunk and drop the rows that need no work; None when nothing is left to do"""
+        ids, texts, payloads = self.payload_builder(df_chunk, self.config, offset)
+        fingerprints = [payload_fingerprint(payload) for payload in payloads]
+        chunk = {
+            "index": index,
+            "offset": offset,
+            "ids": ids,
+            "texts": texts,
+            "payloads": payloads,
+            "fingerprints": fingerprints,
+            "all_ids": ids,
+            "all_fingerprints": fingerprints,
+            "hash": chunk_hash(fingerprints),
+            "payload_updates": [],
+        }
+        self.state.see(chunk)
+        if self.state.is_finished(chunk):
+            return None
+        if self.config.diff:
+            self.state.diff(chunk, payload_updates=self.payload_writer is not None)
+            if not chunk["ids"] and not chunk["payload_updates"]:
+                return None
+        return chunk
+
+    def _write(self, chunk: dict, points, wait: bool = True):
+        if points:
+            self.writer(points, wait=wait)
+        if chunk["payload_updates"]:
+            self.payload_writer(chunk["payload_updates"], wait=wait)
+
+    @staticmethod
+    def _changed_rows(chunk: dict) -> int:
+        return len(chunk["ids"]) + len(chunk["payload_updates"])
+
+    def upsert_chunk(self, df_chunk, index: int, offset: int) -> int:
+        """Embed and upsert one chunk of the dataframe, returning the number of rows written"""
+        try:
+            chunk = self._prepare(df_chunk, index, offset)
+            if chunk is None:
+                return 0
+            embeddings = self.embedder(chunk["texts"]) if chunk["texts"] else []
+            self._write(chunk, stages.make_points(chunk["ids"], embeddings, chunk["payloads"]))
+            self.state.mark_finished(chunk)
+            return self._changed_rows(chunk)
+        except Exception as e:
+            logger.error(f"Failed to process chunk: {e}")
+            raise
+
+    def run(self) -> int:
+        try:
+            if self.config.mode == "pipelined":
+                return self.run_pipelined()
+            return self.run_sequential()
+        finally:
+            for resource in self._resources:
+                resource.close()
+
+    def _max_window_rows(self) -> int:
+        window = self.config.bucket_window if self.config.length_bucketing else 0
+        return self.config.chunk_size + max(window - 1, 0)
+
+    def _windows(self, chunks):
+        """
+        Group consecutive chunks until they hold `bucket_window` rows, so length bucketing
+        has more than one small chunk to sort
+        """
+        window = self.config.bucket_window if self.config.length_bucketing else 0
+        group = []
+        rows = 0
+        for chunk in chunks:
+            group.append(chunk)
+            rows += len(chunk["texts"])
+            if rows >= window:
+                yield group
+                group = []
+                rows = 0
+        if group:
+            yield group
+
+    @staticmethod
+    def _split(group: list, embeddings):
+        """Yield (chunk, embeddings) for each chunk of a window embedded in one call"""
+        start = 0
+        for chunk in group:
+            end = start + len(chunk["texts"])
+            if isinstance(embeddings, dict):  # named vectors
+                yield chunk, {name: vectors[start:end] for name, vectors in embeddings.items()}
+            else:
+                yield chunk, embeddings[start:end]
+            start = end
+
+    def _embed_stream(self, chunks, embed_stats: StageStats):
+        """Yield (chunk, embeddings, error) for every prepared chunk, in input order"""
+        if self.process_embedder is not None:
+            cache = self.embedding_cache
+
+            def submissions():
+                # Only the texts missing from the embedding cache are sent to the workers
+                for group in self._windows(chunks):
+                    texts = [text for chunk in group for text in chunk["texts"]]
+                    cached, missing = cache.lookup(texts) if cache else (None, None)
+                    yield (texts, cached, missing), texts if cache is None else [texts[i] for i in missing], group
+
+            results = self.process_embedder.imap(submissions())
+            while True:
+                # Time spent waiting on the workers is the throughput-limiting embed time
+                with embed_stats.timing():
+                    result = next(results, None)
+                if result is None:
+                    return
+                (texts, cached, missing), embeddings, group, error = result
+                if error is not None:
+                    for chunk in group:
+                        yield chunk, None, error
+                    continue
+                if cache is not None:
+                    embeddings = cache.fill(texts, cached, missing, embeddings)
+                for chunk, chunk_embeddings in self._split(group, embeddings):
+                    yield chunk, chunk_embeddings, None
+        for group in self._windows(chunks):
+            texts = [text for chunk in group for text in chunk["texts"]]
+            try:
+                with embed_stats.timing():
+                    embeddings = self.embedder(texts) if texts else []
+            except Exception as e:
+                for chunk in group:
+                    yield chunk, None, e
+                continue
+            for chunk, chunk_embeddings in self._split(group, embeddings):
+                yield chunk, chunk_embeddings, None
+
+    def _finish(self, total_processed: int):
+        deleted = []
+        if self.config.diff and self._read_complete and not self.state.failed_chunks:
+            # Only a complete, clean pass over the CSV tells which indexed rows were removed
+            deleted = self.state.removed_ids()
+            if deleted and self.deleter is None:
+                logger.warning(f"{len(deleted)} rows were removed from the CSV but no deleter is configured")
+                deleted = []
+            elif deleted:
+                try:
+                    self.deleter(deleted)
+                    logger.info(f"Deleted {len(deleted)} points no longer in the CSV")
+                except Exception as e:
+                    logger.error(f"Could not delete removed rows: {e}")
+                    deleted = []
+        self.state.complete(deleted)
+        if self.qdrant is not None:
+            try:
+                profiles.finish_bulk_load(self.qdrant, self.config.collection_name, self.config.payload_schema,
+                                          profiles.get_profile(self.config.profile))
+            except Exception as e:
+                logger.error(f"Could not finish the collection profile setup: {e}")
+
+        if self.uploader is not None:
+            logger.info(self.uploader.summary())
+            if self.uploader.dead_lettered:
+                logger.warning(f"Replay the failed points with `python -m ingestion.uploader "
+                               f"{self.uploader.dead_letter_path}` or re-run to resume the failed chunks")
+        logger.info(f"Successfully uploaded {total_processed} records to Qdrant!")
+        if self.state.changed_rows:
+            # Drop answers cached by the app against the previous collection contents
+            mark_collection_rebuilt(self.config.collection_name)
+            logger.info("Rebuild the BM25 index (bm25_index.py) if the app uses hybrid retrieval; "
+                        "until then it ignores the now outdated index")
+
+    def run_sequential(self) -> int:
+        index = 0
+        offset = 0
+        total_processed = 0
+
+        try:
+            for chunk in tqdm(self.reader(self.config), desc="Uploading chunks"):
+                start_time = time.time()
+
+                try:
+                    total_processed += self.upsert_chunk(chunk, index, offset)
+                    elapsed = time.time() - start_time
+                    logger.info(f"Chunk processed in {elapsed:.2f} seconds, total records: {offset + len(chunk)}")
+
+                except Exception as e:
+                    logger.error(f"Error processing chunk at offset {offset}: {e}")
+                    self.state.mark_failed()
+                finally:
+                    # Row ids and chunk numbers stay aligned with the CSV even when a chunk fails
+                    offset += len(chunk)
+                    index += 1
+            self._read_complete = True
+
+        except Exception as e:
+            logger.error(f"Fatal error: {e}")
+        finally:
+            self._finish(total_processed)
+        return total_processed
+
+    def run_pipelined(self) -> int:
+        """
+        Read, embed and upsert concurrently. Bounded queues between the stages provide
+        backpressure; upserts are sent without waiting, and every `confirm_every` chunks (and at
+        the end) one waiting write confirms them before they are checkpointed.
+        """
+        config = self.config
+        parsed = queue.Queue(maxsize=config.queue_size)
+        embedded = queue.Queue(maxsize=config.queue_size)
+        stop = threading.Event()
+        stats = {name: StageStats(name) for name in ("read", "embed", "upsert")}
+        accepted = []  # chunks whose writes Qdrant accepted but has not confirmed applying
+        last_write = []  # (chunk, points) of the latest accepted write
+        accepted_lock = threading.Lock()
+        confirm_lock = threading.Lock()
+        confirmed_rows = 0
+
+        def read():
+            index = 0
+            offset = 0
+            try:
+                df_chunks = iter(self.reader(config))
+                while True:
+                    if stop.is_set():
+                        return  # the embed stage stopped early
+                    with stats["read"].timing():
+                        df_chunk = next(df_chunks, None)
+                        if df_chunk is None:
+                            break
+                        chunk = self._prepare(df_chunk, index, offset)
+                    stats["read"].add(len(df_chunk))
+                    if chunk is not None:
+                        parsed.put(chunk)
+                    index += 1
+                    offset += len(df_chunk)
+                self._read_complete = True
+            except Exception as e:
+                logger.error(f"Fatal error while reading at offset {offset}: {e}")
+            finally:
+                parsed.put(_DONE)
+
+        def confirm():
+            """
+            Qdrant applies the updates of a collection in order, so one waiting (idempotent) write
+            issued after the accepted ones returns once they have all been applied
+            """
+            nonlocal confirmed_rows
+            with confirm_lock:
+                with accepted_lock:
+                    chunks = accepted[:]
+                    accepted.clear()
+                    last = tuple(last_write)
+                if not chunks:
+                    return
+                try:
+                    self._write(*last, wait=True)
+                except Exception as e:
+                    logger.error(f"Could not confirm the upserts of {len(chunks)} chunks, "
+                                 f"they are left for the next run: {e}")
+                    for chunk in chunks:
+                        self.state.mark_failed()
+                        stats["upsert"].add_failed(self._changed_rows(chunk))
+                    return
+                for chunk in chunks:
+                    self.state.mark_finished(chunk)
+                    confirmed_rows += self._changed_rows(chunk)
+
+        def upsert():
+            while True:
+                item = embedded.get()
+                if item is _DONE:
+                    return
+                chunk, points = item
+                try:
+                    with stats["upsert"].timing():
+                        self._write(chunk, points, wait=False)
+                    stats["upsert"].add(self._changed_rows(chunk))
+                    with accepted_lock:
+                        accepted.append(chunk)
+                        last_write[:] = [chunk, points]
+                        due = len(accepted) >= config.confirm_every
+                    if due:
+                        with stats["upsert"].timing():
+                            confirm()
+                except Exception as e:
+                    logger.error(f"Error upserting chunk at offset {chunk['offset']}: {e}")
+                    self.state.mark_failed()
+                    stats["upsert"].add_failed(self._changed_rows(chunk))
+
+        reader_thread = threading.Thread(target=read, name="ingest-read", daemon=True)
+        upsert_threads = [
+            threading.Thread(target=upsert, name=f"ingest-upsert-{i}", daemon=True)
+            for i in range(config.upsert_workers)
+        ]
+        reader_thread.start()
+        for thread in upsert_threads:
+            thread.start()
+
+        wall_start = time.perf_counter()
+        progress = tqdm(desc="Embedding rows", unit="rows")
+        def parsed_items():
+            while True:
+                item = parsed.get()
+                if item is _DONE:
+                    return
+                yield item
+
+        try:
+            for chunk, embeddings, error in self._embed_stream(parsed_items(), stats["embed"]):
+                if error is not None:
+                    logger.error(f"Error embedding chunk at offset {chunk['offset']}: {error}")
+                    self.state.mark_failed()
+                    stats["embed"].add_failed(len(chunk["texts"]))
+                else:
+                    stats["embed"].add(len(chunk["texts"]))
+                    embedded.put((chunk, stages.make_points(chunk["ids"], embeddings, chunk["payloads"])))
+                progress.update(len(chunk["texts"]))
+        except BaseException as e:
+            # Includes Ctrl-C: keep the checkpoint so the next run resumes
+            logger.error(f"Pipeline stopped: {e!r}")
+            self.state.mark_failed()
+            raise
+        finally:
+            progress.close()
+            stop.set()
+            for _ in upsert_threads:
+                embedded.put(_DONE)
+            for thread in upsert_threads:
+                thread.join()
+            # The reader may be blocked on a full queue when the embed loop stopped early
+            while reader_thread.is_alive():
+                try:
+                    parsed.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            reader_thread.join()
+            confirm()
+
+            wall = time.perf_counter() - wall_start
+            for stage in stats.values():
+                logger.info(stage.summary())
+            logger.info(f"Wall time {wall:.1f}s ({confirmed_rows / wall if wall else 0.0:.1f} rows/s end to end)")
+            self._finish(confirmed_rows)
+        return confirmed_rows
+
+def run_ingestion(config: IngestConfig) -> int:
+    return IngestPipeline(config).run()
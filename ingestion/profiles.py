@@ -0,0 +1,124 @@
+# ingestion/profiles.py
+"""
+Named Qdrant performance profiles: HNSW graph, quantization, on-disk storage, payload indexes
+and deferred indexing during bulk loads. The same profile gives the search-time parameters
+used by model.py, so the collection and its queries are tuned together.
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Union
+
+from qdrant_client import QdrantClient, models
+
+# Qdrant's default; vectors are indexed once a segment holds this many KB of them
+DEFAULT_INDEXING_THRESHOLD = 20000
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    name: str
+    hnsw_m: Optional[int] = None  # None keeps Qdrant's default (16)
+    hnsw_ef_construct: Optional[int] = None  # default 100
+    search_ef: Optional[int] = None  # HNSW ef at query time; default 128 (or ef_construct)
+    quantization: Optional[str] = None  # None, "int8" (scalar) or "binary"
+    quantization_always_ram: bool = True
+    rescore: bool = True  # re-rank quantized candidates with the original vectors
+    oversampling: float = 2.0  # candidates fetched per requested result before rescoring
+    on_disk_vectors: bool = False  # original vectors memory-mapped instead of in RAM
+    on_disk_payload: bool = False
+    tags_index: bool = True  # keyword payload index on the tags, for filtered search
+    deferred_indexing: bool = True  # build the HNSW graph once after the bulk load
+
+    def hnsw_config(self) -> Optional[models.HnswConfigDiff]:
+        if self.hnsw_m is None and self.hnsw_ef_construct is None:
+            return None
+        return models.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def quantization_config(self):
+        if self.quantization == "int8":
+            return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=self.quantization_always_ram,
+            ))
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(
+                always_ram=self.quantization_always_ram,
+            ))
+        if self.quantization is not None:
+            raise ValueError(f"Unknown quantization {self.quantization!r}")
+        return None
+
+    def search_params(self) -> Optional[models.SearchParams]:
+        quantization = None
+        if self.quantization is not None:
+            quantization = models.QuantizationSearchParams(rescore=self.rescore, oversampling=self.oversampling)
+        if self.search_ef is None and quantization is None:
+            return None
+        return models.SearchParams(hnsw_ef=self.search_ef, quantization=quantization)
+
+
+PROFILES: Dict[str, CollectionProfile] = {
+    # What the build scripts always did: every option at Qdrant's default
+    "default": CollectionProfile("default", tags_index=False, deferred_indexing=False),
+    # int8 vectors in RAM for search, originals used to rescore the short list
+    "balanced": CollectionProfile("balanced", hnsw_m=16, hnsw_ef_construct=128, search_ef=64,
+                                  quantization="int8"),
+    # Originals and payload on disk; only the int8 copy and the graph stay in RAM
+    "low_memory": CollectionProfile("low_memory", hnsw_m=16, hnsw_ef_construct=100, search_ef=64,
+                                    quantization="int8", oversampling=3.0,
+                                    on_disk_vectors=True, on_disk_payload=True),
+    # 1 bit per dimension; suits the 1024-dim bge models, needs more oversampling
+    "binary": CollectionProfile("binary", hnsw_m=16, hnsw_ef_construct=128, search_ef=64,
+                                quantization="binary", oversampling=3.0, on_disk_vectors=True),
+    "high_recall": CollectionProfile("high_recall", hnsw_m=32, hnsw_ef_construct=256, search_ef=128),
+}
+
+
+def get_profile(name: Optional[str]) -> Optional[CollectionProfile]:
+    if name is None:
+        return None
+    if name not in PROFILES:
+        raise ValueError(f"Unknown collection profile {name!r}, expected one of {sorted(PROFILES)}")
+    return PROFILES[name]
+
+
+def tags_key(payload_schema: str) -> str:
+    return "metadata.tags" if payload_schema == "langchain" else "tags"
+
+
+def create_collection(qdrant: QdrantClient, collection_name: str, vector_size: Union[int, Dict[str, int]],
+                      distance: str, profile: Optional[CollectionProfile] = None):
+    """Create a collection (one named vector per entry when `vector_size` is a dict) with a profile"""
+    profile = profile or PROFILES["default"]
+
+    def params(size: int) -> models.VectorParams:
+        return models.VectorParams(size=size, distance=models.Distance(distance),
+                                   on_disk=profile.on_disk_vectors or None)
+
+    if isinstance(vector_size, dict):
+        vectors_config = {name: params(size) for name, size in vector_size.items()}
+    else:
+        vectors_config = params(vector_size)
+    qdrant.create_collection(
+        collection_name=collection_name,
+        vectors_config=vectors_config,
+        hnsw_config=profile.hnsw_config(),
+        quantization_config=profile.quantization_config(),
+        on_disk_payload=profile.on_disk_payload or None,
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0) if profile.deferred_indexing else None,
+    )
+
+
+def finish_bulk_load(qdrant: QdrantClient, collection_name: str, payload_schema: str,
+                     profile: Optional[CollectionProfile] = None):
+    """
+    Add the payload indexes and turn indexing back on, so the HNSW graph is built once.
+    Indexing is restored whenever the existing collection has it off, even when this run has no
+    profile: a run appending to a collection created with deferred indexing must not leave it off.
+    """
+    if profile is not None and profile.tags_index:
+        qdrant.create_payload_index(collection_name, field_name=tags_key(payload_schema),
+                                    field_schema=models.PayloadSchemaType.KEYWORD)
+    optimizer_config = qdrant.get_collection(collection_name).config.optimizer_config
+    if optimizer_config.indexing_threshold == 0:
+        qdrant.update_collection(
+            collection_name, optimizers_config=models.OptimizersConfigDiff(indexing_threshold=DEFAULT_INDEXING_THRESHOLD),
+        )
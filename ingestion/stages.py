@@ -0,0 +1,176 @@
+# ingestion/stages.py
+"""Default ingestion stages: corpus reader, payload builder, embedder and Qdrant writer"""
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from langchain_huggingface import HuggingFaceEmbeddings
+from qdrant_client import QdrantClient, models
+from qdrant_client.http.models import PointStruct
+
+from ingestion import corpus, profiles
+from ingestion.config import IngestConfig
+from ingestion.embedding_cache import EmbeddingCache
+from ingestion.state import content_point_id
+
+logger = logging.getLogger(__name__)
+
+
+def read_chunks(config: IngestConfig) -> Iterator:
+    """
+    Read the corpus in chunks of `chunk_size` rows: DataFrames for a CSV, record batches for a
+    Parquet/Arrow file written by `python -m ingestion.corpus`
+    """
+    return corpus.read_corpus(config.csv_file, config.chunk_size)
+
+
+def split_tags(tags) -> List[str]:
+    return [tag.strip() for tag in str(tags).split(",")]
+
+
+def _format_tags(tags, tags_format: str):
+    """CSV chunks carry the comma-joined string, columnar chunks a list already"""
+    if isinstance(tags, list):
+        return tags if tags_format == "list" else ", ".join(tags)
+    return split_tags(tags) if tags_format == "list" else str(tags)
+
+
+def build_payloads(df_chunk, config: IngestConfig, offset: int) -> Tuple[list, List[str], List[dict]]:
+    """Return the point ids, the texts to embed and the Qdrant payloads for one chunk"""
+    ids = []
+    texts = []
+    payloads = []
+    questions, answers, all_tags = corpus.chunk_columns(df_chunk)
+    for i, (question, answer, row_tags) in enumerate(zip(questions, answers, all_tags)):
+        tags = _format_tags(row_tags, config.tags_format)
+        ids.append(content_point_id(question, answer) if config.id_scheme == "content" else offset + i)
+        texts.append(question)
+        if config.payload_schema == "langchain":
+            # LangChain's Qdrant store reads `page_content` and `metadata` from the payload
+            payloads.append({"page_content": question, "metadata": {"answer": answer, "tags": tags}})
+        else:
+            payloads.append({"question": question, "answer": answer, "tags": tags})
+    return ids, texts, payloads
+
+
+def initialize_qdrant(config: IngestConfig, vector_size: Union[int, Dict[str, int]]) -> QdrantClient:
+    """
+    Initialize Qdrant client and collection; a dict of sizes creates one named vector per model.
+    New collections get the HNSW, quantization and storage settings of `config.profile`.
+    """
+    qdrant = QdrantClient(url=config.url, api_key=config.api_key, timeout=config.timeout)
+
+    exists = qdrant.collection_exists(config.collection_name)
+    if exists and config.recreate:
+        qdrant.delete_collection(config.collection_name)
+        exists = False
+    if not exists:
+        profiles.create_collection(qdrant, config.collection_name, vector_size, config.distance,
+                                   profiles.get_profile(config.profile))
+    elif not config.diff:
+        check_id_scheme(qdrant, config)
+    return qdrant
+
+
+def check_id_scheme(qdrant: QdrantClient, config: IngestConfig):
+    """
+    Refuse to write ids of one scheme into a collection built with the other: every row would
+    be added a second time next to its old point. A --diff run migrates instead, since it
+    deletes the ids that are no longer produced.
+    """
+    points, _ = qdrant.scroll(config.collection_name, limit=1, with_payload=False, with_vectors=False)
+    if not points:
+        return
+    indexed = "row" if isinstance(points[0].id, int) else "content"
+    if indexed != config.id_scheme:
+        raise ValueError(
+            f"Collection {config.collection_name!r} has {indexed!r} point ids but this run writes "
+            f"{config.id_scheme!r} ids, which would duplicate every row. Migrate it with --diff "
+            f"(re-indexes and deletes the old ids) or --recreate, or keep --id-scheme {indexed}."
+        )
+
+
+def initialize_embeddings(config: IngestConfig) -> HuggingFaceEmbeddings:
+    """Initialize embedding model with batching support"""
+    return HuggingFaceEmbeddings(
+        model_name=config.model_name,
+        model_kwargs={"device": config.device},
+        encode_kwargs={"batch_size": config.batch_size, "normalize_embeddings": config.normalize},
+    )
+
+
+def token_lengths(embeddings_model, texts: List[str]) -> List[int]:
+    """Tokenized length of each text, falling back to character length without a tokenizer"""
+    client = getattr(embeddings_model, "_client", None)
+    tokenizer = getattr(client, "tokenizer", None)
+    if tokenizer is None:
+        return [len(text) for text in texts]
+    encoded = tokenizer(texts, truncation=True, max_length=getattr(client, "max_seq_length", None))
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def length_buckets(lengths: List[int], batch_size: int) -> List[List[int]]:
+    """Group text positions into batches of similar length, so little of each batch is padding"""
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def embed_texts(embeddings_model, texts: List[str], prefix: str = "",
+                cache: Optional[EmbeddingCache] = None,
+                bucket_batch_size: Optional[int] = None) -> List[List[float]]:
+    """
+    Embed a batch of texts using HuggingFace embeddings, with an optional instruction prefix.
+    With a cache, only the texts it does not hold yet reach the model. With `bucket_batch_size`,
+    texts are embedded in batches of similar token length and returned in their original order.
+    """
+    if cache is not None:
+        return cache.embed(texts, lambda missing: embed_texts(embeddings_model, missing, prefix,
+                                                              bucket_batch_size=bucket_batch_size))
+    if prefix:
+        texts = [prefix + t for t in texts]
+    try:
+        if not bucket_batch_size or len(texts) <= bucket_batch_size:
+            return embeddings_model.embed_documents(texts)
+        embeddings = [None] * len(texts)
+        for bucket in length_buckets(token_lengths(embeddings_model, texts), bucket_batch_size):
+            for i, embedding in zip(bucket, embeddings_model.embed_documents([texts[i] for i in bucket])):
+                embeddings[i] = embedding
+        return embeddings
+    except Exception as e:
+        logger.error(f"Embedding failed: {e}")
+        raise
+
+
+def _as_list(embedding) -> List[float]:
+    return embedding.tolist() if hasattr(embedding, "tolist") else list(embedding)
+
+
+def make_points(ids: list, embeddings, payloads: List[dict]) -> List[PointStruct]:
+    """`embeddings` is a list of vectors, or a dict of them per named vector"""
+    if isinstance(embeddings, dict):
+        vectors = [
+            {name: _as_list(named[i]) for name, named in embeddings.items()}
+            for i in range(len(ids))
+        ]
+    else:
+        vectors = [_as_list(embedding) for embedding in embeddings]
+    return [
+        PointStruct(id=point_id, vector=vector, payload=payload)
+        for point_id, vector, payload in zip(ids, vectors, payloads)
+    ]
+
+
+def upsert_points(qdrant: QdrantClient, collection_name: str, points: List[PointStruct], wait: bool = True):
+    return qdrant.upsert(collection_name=collection_name, points=points, wait=wait)
+
+
+def overwrite_payloads(qdrant: QdrantClient, collection_name: str, updates: List[tuple], wait: bool = True):
+    """Replace the payload of already indexed points, leaving their vectors untouched"""
+    operations = [
+        models.OverwritePayloadOperation(overwrite_payload=models.SetPayload(payload=payload, points=[point_id]))
+        for point_id, payload in updates
+    ]
+    return qdrant.batch_update_points(collection_name, update_operations=operations, wait=wait)
+
+
+def delete_points(qdrant: QdrantClient, collection_name: str, ids: list, wait: bool = True):
+    return qdrant.delete(collection_name, points_selector=models.PointIdsList(points=ids), wait=wait)
@@ -0,0 +1,161 @@
+# ingestion/state.py
+"""
+Resumable and incremental ingestion.
+
+Points are identified by a hash of their question/answer, so re-running over the same CSV
+overwrites points instead of duplicating them, whatever the row order.
+
+checkpoint  <state_dir>/<collection>.checkpoint.jsonl  one line per finished chunk, removed after a clean run
+manifest    <state_dir>/<collection>.manifest.json     point id -> payload fingerprint of every indexed row
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+from ingestion.config import IngestConfig
+
+logger = logging.getLogger(__name__)
+
+POINT_ID_NAMESPACE = uuid.UUID("6f1c5d2e-8a4b-5c3d-9e7f-0a1b2c3d4e5f")
+
+
+def content_point_id(question: str, answer: str) -> str:
+    """Deterministic point id (a UUID, as Qdrant requires) derived from the question/answer content"""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{question}\x1f{answer}"))
+
+
+def payload_fingerprint(payload: dict) -> str:
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+def chunk_hash(fingerprints: List[str]) -> str:
+    return hashlib.sha1("".join(fingerprints).encode("ascii")).hexdigest()[:16]
+
+
+class IngestState:
+    def __init__(self, config: IngestConfig, qdrant=None):
+        self.config = config
+        os.makedirs(config.state_dir, exist_ok=True)
+        base = os.path.join(config.state_dir, config.collection_name)
+        self.checkpoint_path = base + ".checkpoint.jsonl"
+        self.manifest_path = base + ".manifest.json"
+
+        if config.recreate:
+            # A fresh collection makes both files describe points that no longer exist
+            for path in (self.checkpoint_path, self.manifest_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        self.finished: Dict[int, str] = {}
+        if config.resume:
+            self.finished = self._load_checkpoint()
+            if self.finished:
+                logger.info(f"Resuming: {len(self.finished)} chunks already finished")
+        elif os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+        self.manifest = self._load_manifest()
+        if config.diff and self.manifest is None:
+            self.manifest = self._manifest_from_qdrant(qdrant) if qdrant is not None else {}
+        self.manifest = self.manifest or {}
+
+        self.seen_ids = set()
+        self.failed_chunks = 0
+        self.changed_rows = 0
+        self._lock = threading.Lock()
+
+    def _load_checkpoint(self) -> Dict[int, str]:
+        finished = {}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line of a crashed run
+                    finished[record["chunk"]] = record["hash"]
+        return finished
+
+    def _load_manifest(self) -> Optional[Dict[str, str]]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _manifest_from_qdrant(self, qdrant) -> Dict[str, str]:
+        """Rebuild the manifest from the payloads stored in the collection"""
+        manifest = {}
+        if not qdrant.collection_exists(self.config.collection_name):
+            return manifest
+        next_offset = None
+        while True:
+            points, next_offset = qdrant.scroll(
+                self.config.collection_name, limit=1000, offset=next_offset,
+                with_payload=True, with_vectors=False,
+            )
+            for point in points:
+                manifest[str(point.id)] = payload_fingerprint(point.payload or {})
+            if next_offset is None:
+                break
+        logger.info(f"Rebuilt the manifest of {len(manifest)} points from Qdrant")
+        return manifest
+
+    def see(self, chunk: dict):
+        """Record that the chunk's rows are still part of the corpus"""
+        with self._lock:
+            self.seen_ids.update(map(str, chunk["all_ids"]))
+
+    def is_finished(self, chunk: dict) -> bool:
+        """True when a previous run already finished this exact chunk"""
+        return self.finished.get(chunk["index"]) == chunk["hash"]
+
+    def diff(self, chunk: dict, payload_updates: bool = True):
+        """
+        Keep only the rows that need embedding (new or changed question/answer). Rows whose
+        content is indexed but whose payload changed (e.g. tags) become payload-only updates,
+        or are re-embedded when `payload_updates` is off.
+        """
+        keep = []
+        for i, (point_id, fingerprint) in enumerate(zip(chunk["ids"], chunk["fingerprints"])):
+            indexed = self.manifest.get(str(point_id))
+            if indexed is None or (indexed != fingerprint and not payload_updates):
+                keep.append(i)
+            elif indexed != fingerprint:
+                chunk["payload_updates"].append((point_id, chunk["payloads"][i]))
+        for key in ("ids", "texts", "payloads", "fingerprints"):
+            chunk[key] = [chunk[key][i] for i in keep]
+
+    def mark_finished(self, chunk: dict):
+        with self._lock:
+            self.manifest.update(zip(map(str, chunk["all_ids"]), chunk["all_fingerprints"]))
+            self.changed_rows += len(chunk["ids"]) + len(chunk["payload_updates"])
+            with open(self.checkpoint_path, "a") as f:
+                f.write(json.dumps({"chunk": chunk["index"], "hash": chunk["hash"]}) + "\n")
+
+    def mark_failed(self):
+        with self._lock:
+            self.failed_chunks += 1
+
+    def removed_ids(self) -> list:
+        """Indexed ids that are no longer in the corpus; row ids are returned as the integers Qdrant stores"""
+        return [int(point_id) if point_id.isdigit() else point_id
+                for point_id in self.manifest if point_id not in self.seen_ids]
+
+    def complete(self, deleted_ids: list):
+        """Persist the manifest; the checkpoint is only kept when some chunks failed"""
+        for point_id in deleted_ids:
+            self.manifest.pop(str(point_id), None)
+        self.changed_rows += len(deleted_ids)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        if self.failed_chunks:
+            logger.warning(f"{self.failed_chunks} chunks failed; re-run to resume from the checkpoint")
+        elif os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
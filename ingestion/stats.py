@@ -0,0 +1,42 @@
+# ingestion/stats.py
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageStats:
+    """Rows handled and busy time of one ingestion stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.failed_rows = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timing(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - start
+
+    def add(self, rows: int):
+        with self._lock:
+            self.rows += rows
+
+    def add_failed(self, rows: int):
+        with self._lock:
+            self.failed_rows += rows
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.busy_seconds if self.busy_seconds else 0.0
+
+    def summary(self) -> str:
+        text = f"{self.name}: {self.rows} rows in {self.busy_seconds:.1f}s busy ({self.rows_per_second:.1f} rows/s)"
+        if self.failed_rows:
+            text += f", {self.failed_rows} failed"
+        return text
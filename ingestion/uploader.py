@@ -0,0 +1,266 @@
+# ingestion/uploader.py
+"""
+Bulk point upload with parallel batches, retries and a dead-letter file.
+
+Points are cut into batches of about `batch_bytes` of JSON (vectors + payload) and upserted
+by a pool of threads. Transient errors (timeouts, connection errors, 429/5xx) are retried with
+exponential backoff and jitter; a batch that Qdrant rejects (including a 413 for its size) is
+split in halves until the offending points are isolated, and those, like batches still failing
+after all retries, are appended to the dead-letter file with their vectors, so they can be
+replayed without re-embedding:
+
+    python -m ingestion.uploader .ingest_state/medical_qa_bge_large_en.dead_letter.jsonl
+
+The batch size adapts to the server: it shrinks after a timeout or a 413 and grows back
+after a run of successful batches.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.http.models import PointStruct
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}  # not 413: the same batch would be rejected again
+MIN_BATCH_BYTES = 64 * 1024
+GROW_AFTER = 8  # successful batches in a row before the batch size grows again
+
+
+class UploadFailed(Exception):
+    """Some points of an upload ended up in the dead-letter file"""
+
+    def __init__(self, failed: int, total: int, error: Exception):
+        super().__init__(f"{failed} of {total} points failed permanently: {error}")
+        self.failed = failed
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code in RETRYABLE_STATUS
+    return isinstance(error, (ResponseHandlingException, OSError))
+
+
+def _shrinks_batch(error: Exception) -> bool:
+    """Errors that a smaller request is likely to avoid"""
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code in (408, 413)
+    return isinstance(error, (ResponseHandlingException, TimeoutError))
+
+
+def call_with_retries(fn: Callable, max_retries: int, backoff: float, backoff_max: float,
+                      on_retry: Optional[Callable] = None):
+    """Call `fn`, retrying transient errors with exponential backoff and full jitter"""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_transient(e):
+                raise
+            delay = random.uniform(0, min(backoff_max, backoff * 2 ** attempt))
+            attempt += 1
+            if on_retry is not None:
+                on_retry(e)
+            logger.warning(f"Transient Qdrant error ({e!s:.120}), retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def point_bytes(point: PointStruct) -> int:
+    """Approximate JSON size of a point: ~10 bytes per float plus the payload"""
+    vector = point.vector
+    floats = sum(len(v) for v in vector.values()) if isinstance(vector, dict) else len(vector)
+    return 10 * floats + len(json.dumps(point.payload, ensure_ascii=False, default=str)) + 64
+
+
+class BulkUploader:
+    """Thread-safe; `upload` may be called from several threads, which share the batch pool"""
+
+    def __init__(self, qdrant: QdrantClient, collection_name: str, parallel: int = 4,
+                 batch_bytes: int = 4 * 2**20, max_batch_bytes: int = 32 * 2**20,
+                 max_retries: int = 5, backoff: float = 0.5, backoff_max: float = 30.0,
+                 dead_letter_path: Optional[str] = None):
+        self.qdrant = qdrant
+        self.collection_name = collection_name
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_batch_bytes = max_batch_bytes
+        self.dead_letter_path = dead_letter_path
+        self._batch_bytes = batch_bytes
+        self._successes = 0
+        self._pool = ThreadPoolExecutor(max_workers=max(parallel, 1), thread_name_prefix="qdrant-upload")
+        self._lock = threading.Lock()
+        self._dead_letter_lock = threading.Lock()
+
+        self.points = 0
+        self.bytes = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed_batches = 0
+        self.dead_lettered = 0
+        self._start = time.perf_counter()
+
+    @property
+    def batch_bytes(self) -> int:
+        return self._batch_bytes
+
+    def _batches(self, points: List[PointStruct]):
+        limit = self._batch_bytes
+        batch, size = [], 0
+        for point in points:
+            n = point_bytes(point)
+            if batch and size + n > limit:
+                yield batch, size
+                batch, size = [], 0
+            batch.append(point)
+            size += n
+        if batch:
+            yield batch, size
+
+    def _shrink(self, error: Exception):
+        """Halve the size of later batches after an error that a smaller request is likely to avoid"""
+        if _shrinks_batch(error):
+            self._batch_bytes = max(min(MIN_BATCH_BYTES, self._batch_bytes), self._batch_bytes // 2)
+            self._successes = 0
+
+    def _count_retry(self, error: Exception):
+        with self._lock:
+            self.retries += 1
+            self._shrink(error)
+
+    def _succeeded(self, batch: List[PointStruct], size: int):
+        with self._lock:
+            self.points += len(batch)
+            self.bytes += size
+            self.batches += 1
+            self._successes += 1
+            if self._successes >= GROW_AFTER and size >= self._batch_bytes // 2:
+                self._batch_bytes = min(self.max_batch_bytes, int(self._batch_bytes * 1.25))
+                self._successes = 0
+
+    def _send(self, batch: List[PointStruct], size: int, wait: bool) -> List[tuple]:
+        """Upsert one batch; returns the (point, error) pairs that could not be written"""
+        try:
+            call_with_retries(
+                lambda: self.qdrant.upsert(collection_name=self.collection_name, points=batch, wait=wait),
+                self.max_retries, self.backoff, self.backoff_max, on_retry=self._count_retry,
+            )
+        except Exception as e:
+            with self._lock:
+                self.failed_batches += 1
+                self._shrink(e)
+            if len(batch) == 1 or is_transient(e):
+                # Out of retries: the server is unreachable or overloaded, not this batch's fault
+                return [(point, e) for point in batch]
+            # Rejected: bisect so that one bad point does not take its whole batch down
+            half = len(batch) // 2
+            return (self._send(batch[:half], sum(map(point_bytes, batch[:half])), wait)
+                    + self._send(batch[half:], sum(map(point_bytes, batch[half:])), wait))
+        self._succeeded(batch, size)
+        return []
+
+    def upload(self, points: List[PointStruct], wait: bool = True) -> int:
+        """
+        Upsert `points` in parallel batches and return how many were written. Points that fail
+        permanently go to the dead-letter file and an UploadFailed is raised once the rest is done.
+        """
+        futures = [self._pool.submit(self._send, batch, size, wait) for batch, size in self._batches(points)]
+        failures = [failure for future in futures for failure in future.result()]
+        if failures:
+            self._dead_letter(failures)
+            raise UploadFailed(len(failures), len(points), failures[-1][1])
+        return len(points)
+
+    def _dead_letter(self, failures: List[tuple]):
+        with self._lock:
+            self.dead_lettered += len(failures)
+        if not self.dead_letter_path:
+            return
+        os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+        with self._dead_letter_lock, open(self.dead_letter_path, "a") as f:
+            for point, error in failures:
+                f.write(json.dumps({
+                    "collection": self.collection_name,
+                    "id": point.id,
+                    "vector": point.vector,
+                    "payload": point.payload,
+                    "error": str(error)[:500],
+                    "time": time.time(),
+                }, ensure_ascii=False, default=str) + "\n")
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self._start
+        text = (f"upload: {self.points} points in {self.batches} batches, {self.bytes / 2**20:.1f}MB "
+                f"({self.points / elapsed if elapsed else 0.0:.1f} points/s), {self.retries} retries, "
+                f"{self.failed_batches} failed batches, final batch size {self._batch_bytes / 2**20:.2f}MB")
+        if self.dead_lettered:
+            text += f", {self.dead_lettered} points dead-lettered to {self.dead_letter_path}"
+        return text
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+def read_dead_letter(path: str) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay(path: str, qdrant: QdrantClient, **uploader_kwargs) -> int:
+    """
+    Upload the points of a dead-letter file again. Points that still fail are written to a fresh
+    dead-letter file that replaces the old one; the file is removed once everything is written.
+    """
+    records = read_dead_letter(path)
+    by_collection = {}
+    for record in records:
+        # Later entries of the same point are newer
+        by_collection.setdefault(record["collection"], {})[record["id"]] = record
+    retry_path = path + ".retry"
+    written = 0
+    for collection_name, entries in by_collection.items():
+        uploader = BulkUploader(qdrant, collection_name, dead_letter_path=retry_path, **uploader_kwargs)
+        try:
+            written += uploader.upload([
+                PointStruct(id=record["id"], vector=record["vector"], payload=record["payload"])
+                for record in entries.values()
+            ])
+        except UploadFailed as e:
+            logger.error(f"{collection_name}: {e}")
+            written += len(entries) - e.failed
+        finally:
+            uploader.close()
+            logger.info(uploader.summary())
+    if os.path.exists(retry_path):
+        os.replace(retry_path, path)
+    else:
+        os.remove(path)
+    return written
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Replay the points of an ingestion dead-letter file")
+    parser.add_argument("dead_letter", help="The <collection>.dead_letter.jsonl file in the ingestion state dir")
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--api-key")
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=5)
+    args = parser.parse_args()
+
+    qdrant = QdrantClient(url=args.url, api_key=args.api_key, timeout=60)
+    written = replay(args.dead_letter, qdrant, parallel=args.parallel, max_retries=args.retries)
+    logger.info(f"Replayed {written} points from {args.dead_letter}")
+
+
+if __name__ == "__main__":
+    main()
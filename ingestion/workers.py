@@ -0,0 +1,146 @@
+# ingestion/workers.py
+"""
+Multi-process embedding for ingestion.
+
+Every worker process loads the sentence-transformer once, limits itself to a fixed set of
+threads (pinned to its own CPUs where the OS allows it) and writes embeddings straight into
+a shared-memory slot owned by the parent, so results never travel as pickled Python lists.
+"""
+import logging
+import os
+import queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ingestion import stages
+from ingestion.config import IngestConfig
+
+logger = logging.getLogger(__name__)
+
+# Worker process state, set by _init_worker
+_worker = {}
+
+
+def _init_worker(config: IngestConfig, slot_names: List[str], dim: int, max_rows: int,
+                 worker_ids, threads: int):
+    worker_id = worker_ids.get()
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    if hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        mine = {cpus[(worker_id * threads + i) % len(cpus)] for i in range(threads)}
+        os.sched_setaffinity(0, mine)
+
+    import torch
+    torch.set_num_threads(threads)
+
+    _worker["config"] = config
+    _worker["model"] = stages.initialize_embeddings(config)
+    _worker["slots"] = []
+    for name in slot_names:
+        shm = SharedMemory(name=name)
+        # The parent owns (and unlinks) the segments; keep the resource tracker from doing it too
+        resource_tracker.unregister(shm._name, "shared_memory")
+        _worker["slots"].append((shm, np.ndarray((max_rows, dim), dtype=np.float32, buffer=shm.buf)))
+
+
+def _probe_dim(config: IngestConfig) -> int:
+    model = stages.initialize_embeddings(config)
+    return len(stages.embed_texts(model, ["probe"], config.text_prefix)[0])
+
+
+def _embed_into_slot(slot: int, texts: List[str]) -> int:
+    config = _worker["config"]
+    embeddings = stages.embed_texts(_worker["model"], texts, config.text_prefix,
+                                    bucket_batch_size=config.bucket_batch_size)
+    _worker["slots"][slot][1][:len(texts)] = embeddings
+    return len(texts)
+
+
+class ProcessEmbedder:
+    """Process pool of embedding workers returning results through shared memory slots"""
+
+    def __init__(self, config: IngestConfig, workers: int, threads_per_worker: Optional[int] = None,
+                 max_rows: Optional[int] = None):
+        self.workers = workers
+        self.threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.max_rows = max_rows or config.chunk_size
+        context = get_context("spawn")
+
+        self.dim = config.vector_size
+        if self.dim is None:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as probe:
+                self.dim = probe.submit(_probe_dim, config).result()
+
+        # Two slots per worker keep every worker busy while the parent drains finished slots
+        self._shms = [
+            SharedMemory(create=True, size=self.max_rows * self.dim * 4)
+            for _ in range(workers * 2)
+        ]
+        self._arrays = [
+            np.ndarray((self.max_rows, self.dim), dtype=np.float32, buffer=shm.buf) for shm in self._shms
+        ]
+        self._free_slots = queue.Queue()
+        for slot in range(len(self._shms)):
+            self._free_slots.put(slot)
+
+        worker_ids = context.Queue()
+        for worker_id in range(workers):
+            worker_ids.put(worker_id)
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=_init_worker,
+            initargs=(config, [shm.name for shm in self._shms], self.dim, self.max_rows,
+                      worker_ids, self.threads),
+        )
+        logger.info(f"Started {workers} embedding workers with {self.threads} threads each")
+
+    def _submit(self, texts: List[str]):
+        if len(texts) > self.max_rows:
+            raise ValueError(f"Chunk of {len(texts)} rows exceeds the {self.max_rows}-row shared memory slot")
+        if not texts:
+            return None, None  # e.g. every text was found in the embedding cache
+        slot = self._free_slots.get()
+        return slot, self._pool.submit(_embed_into_slot, slot, texts)
+
+    def _collect(self, slot: Optional[int], future) -> List[List[float]]:
+        if slot is None:
+            return []
+        try:
+            n = future.result()
+            return self._arrays[slot][:n].tolist()
+        finally:
+            self._free_slots.put(slot)
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        return self._collect(*self._submit(texts))
+
+    def imap(self, items: Iterable[Tuple[object, List[str], object]]) -> Iterator[tuple]:
+        """
+        Embed (key, texts, context) items with every worker busy, yielding
+        (key, embeddings, context, error) in input order; error is None on success.
+        """
+        in_flight = deque()
+        for key, texts, context in items:
+            if len(in_flight) >= len(self._shms):
+                yield self._next_result(in_flight)
+            in_flight.append((key, texts, context, *self._submit(texts)))
+        while in_flight:
+            yield self._next_result(in_flight)
+
+    def _next_result(self, in_flight: deque) -> tuple:
+        key, texts, context, slot, future = in_flight.popleft()
+        try:
+            return key, self._collect(slot, future), context, None
+        except Exception as e:
+            return key, None, context, e
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
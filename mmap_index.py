@@ -0,0 +1,253 @@
+# mmap_index.py
+"""
+In-process vector index for single-node deployments.
+
+`export` dumps a Qdrant collection to a directory holding
+    vectors.npy    float32/float16 matrix (one row per point, memory-mapped at load time)
+    offsets.npy    int64 offsets of each record in payloads.bin (n + 1 entries)
+    payloads.bin   concatenated JSON records {"id", "question", "answer", "tags"}
+    meta.json      collection name, dimension, dtype, distance
+and MmapVectorIndex searches it with vectorized dot products instead of calling Qdrant.
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import shutil
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import Field
+from qdrant_client import QdrantClient
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+OFFSETS_FILE = "offsets.npy"
+PAYLOADS_FILE = "payloads.bin"
+META_FILE = "meta.json"
+
+# Rows scored per matmul; bounds the float32 temporaries when the matrix is float16
+SCORE_BLOCK_ROWS = 8192
+
+
+def _normalize_payload(point_id, payload: dict) -> dict:
+    """Flatten both payload layouts (LangChain page_content/metadata and flat question/answer/tags)"""
+    if "page_content" in payload:
+        metadata = payload.get("metadata") or {}
+        question = payload.get("page_content", "")
+        answer = metadata.get("answer", "")
+        tags = metadata.get("tags", [])
+    else:
+        question = payload.get("question", "")
+        answer = payload.get("answer", "")
+        tags = payload.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",")]
+    return {"id": point_id, "question": question, "answer": answer, "tags": tags}
+
+
+class PayloadWriter:
+    """Append JSON records to payloads.bin and track their offsets"""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self._file = open(os.path.join(index_dir, PAYLOADS_FILE), "wb")
+        self._offsets = [0]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def write(self, record: dict):
+        data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def close(self):
+        self._file.close()
+        np.save(os.path.join(self.index_dir, OFFSETS_FILE), np.asarray(self._offsets, dtype=np.int64))
+
+
+class PayloadStore:
+    """Memory-mapped reader for the records written by PayloadWriter"""
+
+    def __init__(self, index_dir: str, collection_name: str):
+        self.collection_name = collection_name
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode="r")
+        self._file = open(os.path.join(index_dir, PAYLOADS_FILE), "rb")
+        self._data = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.offsets[-1] > 0 else b""
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def record(self, row: int) -> dict:
+        return json.loads(bytes(self._data[self.offsets[row]:self.offsets[row + 1]]))
+
+    def document(self, row: int) -> Document:
+        record = self.record(row)
+        return Document(
+            page_content=record["question"],
+            metadata={"answer": record["answer"], "tags": record["tags"],
+                      "_id": record["id"], "_collection_name": self.collection_name},
+        )
+
+
+def export_collection(client: QdrantClient, collection_name: str, out_dir: str,
+                      dtype: str = "float32", vector_name: Optional[str] = None,
+                      batch_size: int = 1024):
+    """Dump a Qdrant collection (vectors + payloads) into the memory-mappable format"""
+    info = client.get_collection(collection_name)
+    vectors_config = info.config.params.vectors
+    params = vectors_config[vector_name] if vector_name else vectors_config
+    dim = params.size
+    distance = str(getattr(params.distance, "value", params.distance))
+    if distance not in ("Cosine", "Dot"):
+        raise ValueError(f"Unsupported distance for the mmap index: {distance}")
+    count = client.count(collection_name, exact=True).count
+
+    tmp_dir = out_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    vectors = np.lib.format.open_memmap(
+        os.path.join(tmp_dir, VECTORS_FILE), mode="w+", dtype=np.dtype(dtype), shape=(count, dim)
+    )
+    payloads = PayloadWriter(tmp_dir)
+
+    row = 0
+    next_offset = None
+    while True:
+        points, next_offset = client.scroll(
+            collection_name, limit=batch_size, offset=next_offset,
+            with_payload=True, with_vectors=[vector_name] if vector_name else True,
+        )
+        for point in points:
+            if row >= count:
+                break
+            vector = point.vector[vector_name] if vector_name else point.vector
+            v = np.asarray(vector, dtype=np.float32)
+            if distance == "Cosine":
+                v /= np.linalg.norm(v) or 1.0
+            vectors[row] = v
+            payloads.write(_normalize_payload(point.id, point.payload or {}))
+            row += 1
+        if next_offset is None or row >= count:
+            break
+
+    payloads.close()
+    vectors.flush()
+    del vectors
+    if row != count:
+        # Points were deleted while exporting; keep only the rows that were written
+        trimmed = np.load(os.path.join(tmp_dir, VECTORS_FILE), mmap_mode="r")[:row].copy()
+        np.save(os.path.join(tmp_dir, VECTORS_FILE), trimmed)
+    with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+        json.dump({"collection_name": collection_name, "dim": dim, "dtype": dtype,
+                   "distance": distance, "count": row}, f)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    logger.info(f"Exported {row} points from {collection_name} to {out_dir}")
+
+
+class MmapVectorIndex:
+    """
+    Read-only vector index over an exported collection.
+    The matrix and payloads are memory-mapped, so worker processes share the same pages.
+    """
+
+    def __init__(self, index_dir: str, embedding=None):
+        self.index_dir = index_dir
+        self.embedding = embedding
+        with open(os.path.join(index_dir, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.collection_name = self.meta["collection_name"]
+        self.vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode="r")
+        self.payloads = PayloadStore(index_dir, self.collection_name)
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def _prepare_queries(self, query_vectors) -> np.ndarray:
+        q = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        if self.meta["distance"] == "Cosine":
+            norms = np.linalg.norm(q, axis=1, keepdims=True)
+            q = q / np.where(norms > 0, norms, 1.0)
+        return q
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        """(n_queries, n_points) similarity matrix, computed block by block"""
+        n = len(self)
+        scores = np.empty((queries.shape[0], n), dtype=np.float32)
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[:, start:start + block.shape[0]] = queries @ block.T
+        return scores
+
+    def _top_k(self, scores: np.ndarray, k: int,
+               score_threshold: Optional[float]) -> List[Tuple[Document, float]]:
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (self.payloads.document(int(row)), float(scores[row]))
+            for row in top
+            if score_threshold is None or scores[row] >= score_threshold
+        ]
+
+    def similarity_search_with_score_by_vector(self, embedding: Sequence[float], k: int = 4,
+                                               score_threshold: Optional[float] = None,
+                                               **kwargs) -> List[Tuple[Document, float]]:
+        scores = self._scores(self._prepare_queries(embedding))[0]
+        return self._top_k(scores, k, score_threshold)
+
+    def search_batch_by_vectors(self, embeddings, k: int = 4,
+                                score_threshold: Optional[float] = None) -> List[List[Tuple[Document, float]]]:
+        scores = self._scores(self._prepare_queries(embeddings))
+        return [self._top_k(row_scores, k, score_threshold) for row_scores in scores]
+
+    def as_retriever(self, search_type: str = "similarity", search_kwargs: Optional[dict] = None) -> "MmapRetriever":
+        if search_type not in ("similarity", "similarity_score_threshold"):
+            raise ValueError(f"Unsupported search_type for the mmap index: {search_type}")
+        return MmapRetriever(index=self, search_kwargs=search_kwargs or {})
+
+
+class MmapRetriever(BaseRetriever):
+    """LangChain retriever over a MmapVectorIndex, mirroring vectorstore.as_retriever"""
+
+    index: Any
+    search_kwargs: dict = Field(default_factory=dict)
+
+    def _get_relevant_documents(self, query: str, *,
+                                run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        vector = self.index.embedding.embed_query(query)
+        return [doc for doc, _ in self.index.similarity_search_with_score_by_vector(vector, **self.search_kwargs)]
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export a Qdrant collection to a memory-mapped index")
+    parser.add_argument("--collection", default="medical_qa_bge_large_en")
+    parser.add_argument("--out", help="Output directory (default: indexes/<collection>)")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--vector-name", default=None)
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL", "http://localhost:6333"))
+    parser.add_argument("--api-key", default=os.getenv("QDRANT_API_KEY"))
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.url, api_key=args.api_key, timeout=60)
+    export_collection(client, args.collection, args.out or os.path.join("indexes", args.collection),
+                      dtype=args.dtype, vector_name=args.vector_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,30 @@
 # model.py
 from prompt_toolkit import prompt
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, models
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_ollama import OllamaLLM as Ollama
 from langchain.prompts import PromptTemplate
 from langchain_qdrant import Qdrant
+import logging
+import os
+import random
 import textwrap
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from answer_cache import SemanticAnswerCache
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from context_builder import ContextBuilder
+from ingestion.profiles import get_profile
+from mmap_index import MmapVectorIndex
+from pipeline_metrics import PipelineMetrics, StageTimer, start_metrics_server
+from reranker import CrossEncoderReranker
+
+logger = logging.getLogger(__name__)
 
 # Configuration
 
@@ -17,15 +36,117 @@ QDRANT_COLLECTION_NAME = "medical_qa_bge_large_en"
 QDRANT_URL = "http://localhost:6333"   
 QDRANT_API_KEY = None 
 
+# Multi-model collections (python -m ingestion --preset multi_model) hold one named vector per
+# embedding model. QDRANT_VECTOR_NAME is the default one (None for single-vector collections);
+# the answer functions take a `vector_name` to query another one.
+QDRANT_VECTOR_NAME = None
+VECTOR_MODELS = {
+    "bge_large_en": "BAAI/bge-large-en",
+    "bge_m3": "BAAI/bge-m3",
+    "multilingual_e5_base": "intfloat/multilingual-e5-base",
+}
+if QDRANT_VECTOR_NAME is not None:
+    EMBEDDING_MODEL_NAME = VECTOR_MODELS[QDRANT_VECTOR_NAME]
+
+RETRIEVAL_K = 5
+RETRIEVAL_SCORE_THRESHOLD = 0.7
+
+# Search-time HNSW ef / quantization rescoring of the profile the collection was built with
+# (python -m ingestion --profile ...); None uses Qdrant's defaults
+QDRANT_SEARCH_PROFILE = None
+
+# Retrieval backend: "qdrant" (HTTP) or "mmap" (in-process index exported with mmap_index.py)
+RETRIEVAL_BACKEND = "qdrant"
+MMAP_INDEX_DIR = f"indexes/{QDRANT_COLLECTION_NAME}"
+
+# Hybrid retrieval: BM25 hits (index built with bm25_index.py) fused with the dense results
+HYBRID_ENABLED = True
+BM25_INDEX_DIR = f"indexes/{QDRANT_COLLECTION_NAME}_bm25"
+BM25_TOP_K = 5
+BM25_MIN_SCORE = 5.0  # raw BM25 score; drops matches on a single common word
+RRF_K = 60
+
+# Cross-encoder rerank: fetch a wider candidate set, keep only the best snippets for the prompt
+RERANK_ENABLED = False
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_CANDIDATES = 20
+RERANK_TOP_N = 3
+RERANK_MIN_SCORE = None  # calibrated cross-encoder score, None keeps the top N regardless
+RERANK_TIME_BUDGET_MS = 150
+
+# Documents fetched per query before fusion / reranking
+CANDIDATE_K = RERANK_CANDIDATES if RERANK_ENABLED else RETRIEVAL_K
+
+# Context assembly: near-duplicate snippets are dropped, the rest must fit the token budget
+CONTEXT_TOKEN_BUDGET = 1200
+CONTEXT_DEDUP_THRESHOLD = 0.8  # word-set Jaccard similarity between two Q&A pairs
+CONTEXT_TOKENIZER_NAME = None  # e.g. a llama3 tokenizer on the Hugging Face hub; None uses a fast estimate
+
+# Direct-answer fast path: serve the stored answer of a near-verbatim corpus question without llama3
+DIRECT_ANSWER_ENABLED = True
+DIRECT_ANSWER_MIN_SCORE = 0.95
+DIRECT_ANSWER_MIN_MARGIN = 0.03  # lead over the runner-up document
+
+# Voice questions: retrieval starts on the partial transcript while Whisper is still decoding,
+# and is redone only when the transcript's embedding moves further than this (cosine distance)
+SPECULATIVE_MIN_WORDS = 3
+SPECULATIVE_REFRESH_DISTANCE = 0.05
+
+# Parallel llama3 requests issued by generate_safe_answers
+LLM_MAX_CONCURRENCY = 4
+# Queries per Qdrant batch request; 256 JSON vectors of 1024 dims stay far below Qdrant's 32 MB request limit
+SEARCH_BATCH_SIZE = 256
+
+# Observability: Prometheus text endpoint, off unless MEDIMIND_METRICS_PORT is set (e.g. 9108) and bound
+# to MEDIMIND_METRICS_HOST (localhost by default), and sampled debug logging
+METRICS_PORT = int(os.getenv("MEDIMIND_METRICS_PORT") or 0) or None
+METRICS_HOST = os.getenv("MEDIMIND_METRICS_HOST", "127.0.0.1")
+DEBUG_LOG_SAMPLE_RATE = 0.05
+
+# Semantic answer cache (cosine distance between questions, LRU + TTL eviction)
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_MAX_ENTRIES = 512
+ANSWER_CACHE_TTL_SECONDS = 3600
+ANSWER_CACHE_MAX_DISTANCE = 0.05
+
 # 2. Set up vectorstore
 embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
 
-vectorstore = Qdrant.from_existing_collection(
-    collection_name=QDRANT_COLLECTION_NAME,
-    embedding=embedding_model,
-    url=QDRANT_URL,
-    api_key=QDRANT_API_KEY,
-)
+if RETRIEVAL_BACKEND == "mmap":
+    vectorstore = MmapVectorIndex(MMAP_INDEX_DIR, embedding=embedding_model)
+else:
+    vectorstore = Qdrant.from_existing_collection(
+        collection_name=QDRANT_COLLECTION_NAME,
+        embedding=embedding_model,
+        url=QDRANT_URL,
+        api_key=QDRANT_API_KEY,
+        vector_name=QDRANT_VECTOR_NAME,
+    )
+
+SEARCH_PARAMS = get_profile(QDRANT_SEARCH_PROFILE).search_params() if QDRANT_SEARCH_PROFILE else None
+
+# Other named vectors of the collection: vector name -> (query embedding model, vector store)
+_vector_backends = {}
+_vector_backends_lock = threading.Lock()
+
+
+def vector_backend(vector_name: Optional[str] = None) -> tuple:
+    """Query embedding model and vector store of a named vector; None is the default one"""
+    if vector_name is None or vector_name == QDRANT_VECTOR_NAME:
+        return embedding_model, vectorstore
+    with _vector_backends_lock:
+        backend = _vector_backends.get(vector_name)
+        if backend is None:
+            if RETRIEVAL_BACKEND == "mmap":
+                raise ValueError("The mmap index holds a single vector; export the one to serve instead")
+            if vector_name not in VECTOR_MODELS:
+                raise ValueError(f"Unknown vector {vector_name!r}, expected one of {sorted(VECTOR_MODELS)}")
+            model = HuggingFaceEmbeddings(model_name=VECTOR_MODELS[vector_name])
+            # Same client and collection, only the vector searched differs
+            store = Qdrant(client=vectorstore.client, collection_name=QDRANT_COLLECTION_NAME,
+                           embeddings=model, vector_name=vector_name)
+            backend = _vector_backends[vector_name] = (model, store)
+        return backend
 
 # 3. Load LLaMA 3 using Ollama
 llm = Ollama(model="llama3", temperature=0.3)
@@ -75,25 +196,413 @@ FINAL ANSWER:
 # 5. Create the retriever
 retriever = vectorstore.as_retriever(
     search_type="similarity_score_threshold",
-    search_kwargs={"k": 5, "score_threshold": 0.7}
+    search_kwargs={"k": RETRIEVAL_K, "score_threshold": RETRIEVAL_SCORE_THRESHOLD,
+                   **({"search_params": SEARCH_PARAMS} if SEARCH_PARAMS is not None else {})}
 )
 
-# 6. Generate Answer
-def generate_safe_answer(user_question: str):
-    docs = retriever.invoke(user_question)
+context_builder = ContextBuilder(
+    token_budget=CONTEXT_TOKEN_BUDGET,
+    dedup_threshold=CONTEXT_DEDUP_THRESHOLD,
+    tokenizer_name=CONTEXT_TOKENIZER_NAME,
+)
 
-    if not docs:
-        return "I'm sorry, I couldn't find relevant information. Please consult a medical professional."
-    print("\n📥 Retrieved Documents:")
-    for i, doc in enumerate(docs):
-        print(f"--- Document {i+1} ---")
-        print(f"Question: {doc.page_content}")
-        print(f"Answer: {doc.metadata.get('answer')}")
-        print(f"Tags: {doc.metadata.get('tags')}\n")
-    context_snippets = "\n\n".join([
-        f"- Q: {doc.page_content}\n  A: {doc.metadata.get('answer', '')}" for doc in docs
-    ])
+answer_cache = SemanticAnswerCache(
+    QDRANT_COLLECTION_NAME,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+    max_distance=ANSWER_CACHE_MAX_DISTANCE,
+)
+# Query vectors of different models are not comparable, so each named vector has its own cache
+_answer_caches = {QDRANT_VECTOR_NAME: answer_cache}
+
+
+def get_answer_cache(vector_name: Optional[str] = None) -> SemanticAnswerCache:
+    vector_name = QDRANT_VECTOR_NAME if vector_name is None else vector_name
+    with _vector_backends_lock:
+        cache = _answer_caches.get(vector_name)
+        if cache is None:
+            cache = _answer_caches[vector_name] = SemanticAnswerCache(
+                QDRANT_COLLECTION_NAME,
+                max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                max_distance=ANSWER_CACHE_MAX_DISTANCE,
+            )
+        return cache
+
+
+bm25_index = BM25Index(BM25_INDEX_DIR) if HYBRID_ENABLED and os.path.isdir(BM25_INDEX_DIR) else None
+
+
+reranker = (
+    CrossEncoderReranker(RERANK_MODEL_NAME, collection_name=QDRANT_COLLECTION_NAME,
+                         time_budget_ms=RERANK_TIME_BUDGET_MS)
+    if RERANK_ENABLED else None
+)
+
+
+def refine_docs(user_question: str, dense_docs):
+    """
+    Fuse dense results with BM25 hits (reciprocal rank fusion) when hybrid retrieval is on,
+    then narrow the candidates with the cross-encoder when reranking is on.
+    """
+    docs = dense_docs
+    if bm25_index is not None and bm25_index.is_current():
+        lexical_docs = [doc for doc, _ in bm25_index.search(user_question, k=BM25_TOP_K, min_score=BM25_MIN_SCORE)]
+        docs = reciprocal_rank_fusion([dense_docs, lexical_docs], limit=CANDIDATE_K, rrf_k=RRF_K)
+    if reranker is not None:
+        return reranker.rerank(user_question, docs, top_n=RERANK_TOP_N,
+                               min_score=RERANK_MIN_SCORE, fallback_k=RETRIEVAL_K)
+    return docs[:RETRIEVAL_K]
+
+
+def dense_search(query_vector, vector_name: Optional[str] = None) -> List[tuple]:
+    """Same search as `retriever` (as (doc, similarity) pairs), reusing an already computed query embedding"""
+    _, store = vector_backend(vector_name)
+    return store.similarity_search_with_score_by_vector(
+        query_vector, k=CANDIDATE_K, score_threshold=RETRIEVAL_SCORE_THRESHOLD, search_params=SEARCH_PARAMS
+    )
+
+
+def dense_search_batch(query_vectors, vector_name: Optional[str] = None) -> List[List[tuple]]:
+    """Run the dense search for many query vectors, `SEARCH_BATCH_SIZE` per Qdrant round trip"""
+    _, store = vector_backend(vector_name)
+    if RETRIEVAL_BACKEND == "mmap":
+        return store.search_batch_by_vectors(
+            query_vectors, k=CANDIDATE_K, score_threshold=RETRIEVAL_SCORE_THRESHOLD
+        )
+
+    requests = [
+        models.QueryRequest(
+            query=vector,
+            using=store.vector_name,
+            limit=CANDIDATE_K,
+            score_threshold=RETRIEVAL_SCORE_THRESHOLD,
+            params=SEARCH_PARAMS,
+            with_payload=True,
+        )
+        for vector in query_vectors
+    ]
+    responses = [
+        response
+        for i in range(0, len(requests), SEARCH_BATCH_SIZE)
+        for response in store.client.query_batch_points(
+            collection_name=QDRANT_COLLECTION_NAME, requests=requests[i:i + SEARCH_BATCH_SIZE]
+        )
+    ]
+    return [
+        [
+            (
+                Qdrant._document_from_scored_point(
+                    point, QDRANT_COLLECTION_NAME,
+                    store.content_payload_key, store.metadata_payload_key,
+                ),
+                point.score,
+            )
+            for point in response.points
+        ]
+        for response in responses
+    ]
+
+
+def retrieve_by_vector(query_vector, user_question: Optional[str] = None, vector_name: Optional[str] = None):
+    """Dense search followed by fusion / reranking when the question text is given"""
+    docs = [doc for doc, _ in dense_search(query_vector, vector_name)]
+    if user_question is not None:
+        docs = refine_docs(user_question, docs)
+    return docs
+
+
+def direct_answer_doc(dense_results):
+    """
+    Return the top document when it is a near-verbatim match of the question and clearly
+    ahead of the runner-up, so its stored answer can be served without calling the LLM.
+    """
+    if not DIRECT_ANSWER_ENABLED or not dense_results:
+        return None
+    top_doc, top_score = dense_results[0]
+    runner_up_score = dense_results[1][1] if len(dense_results) > 1 else 0.0
+    if top_score >= DIRECT_ANSWER_MIN_SCORE and top_score - runner_up_score >= DIRECT_ANSWER_MIN_MARGIN:
+        return top_doc
+    return None
+
+
+NO_DOCS_ANSWER = "I'm sorry, I couldn't find relevant information. Please consult a medical professional."
+
+# Stage latencies (embed, search, refine, context, llm, total) and answers served per path
+metrics = PipelineMetrics()
+
+
+def serve_metrics():
+    """Start the metrics endpoint when one is configured; called by the app, never on import"""
+    if METRICS_PORT:
+        return start_metrics_server(metrics, METRICS_PORT, METRICS_HOST)
+    return None
+
+
+def _log_sampled() -> bool:
+    """Full documents and prompts are logged for a sample of requests only"""
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < DEBUG_LOG_SAMPLE_RATE
+
+
+def build_prompt(user_question: str, docs) -> tuple:
+    """
+    Format the RAG prompt from the retrieved documents (deduplicated and kept within the
+    context token budget). Returns the prompt and its token count, or (None, 0) when no
+    document fits in the budget.
+    """
+    context_snippets, kept_docs = context_builder.build(docs)
+    if not kept_docs:
+        return None, 0
     prompt = rag_prompt.format(context=context_snippets, question=user_question)
-    print("\n📄 Final Context Passed to Model:\n", context_snippets)
-    print("\n🧠 Final Prompt:\n", prompt)
-    return llm.invoke(prompt)
\ No newline at end of file
+    prompt_tokens = context_builder.count_tokens(prompt)
+    if _log_sampled():
+        for i, doc in enumerate(kept_docs):
+            logger.debug("Document %d: question=%r answer=%r tags=%r", i + 1, doc.page_content,
+                         doc.metadata.get("answer"), doc.metadata.get("tags"))
+        logger.debug("Final prompt (%d of %d documents, %d tokens):\n%s", len(kept_docs), len(docs),
+                     prompt_tokens, prompt)
+    return prompt, prompt_tokens
+
+
+def cosine_distance(a, b) -> float:
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    return 1.0 - float(a @ b) / (float(np.linalg.norm(a) * np.linalg.norm(b)) or 1.0)
+
+
+class SpeculativeRetrieval:
+    """
+    Dense retrieval for a voice question whose transcript is still growing. `update` is called
+    with the transcript so far after each Whisper segment; a background thread embeds the latest
+    text and searches Qdrant again only when its embedding has moved more than
+    `refresh_distance` from the one last searched. `finish` returns the query vector and dense
+    results for the final transcript, reusing the speculative search whenever it still holds.
+    """
+
+    def __init__(self, vector_name: Optional[str] = None, min_words: int = SPECULATIVE_MIN_WORDS,
+                 refresh_distance: float = SPECULATIVE_REFRESH_DISTANCE):
+        self.vector_name = vector_name
+        self.query_model, _ = vector_backend(vector_name)
+        self.min_words = min_words
+        self.refresh_distance = refresh_distance
+        self.searches = 0
+        self._lock = threading.Lock()
+        self._pending = None  # latest transcript the worker has not embedded yet
+        self._worker = None
+        self._text = None  # last embedded transcript and its vector
+        self._vector = None
+        self._searched_vector = None
+        self._dense_results = None
+
+    def update(self, transcript: str):
+        if len(transcript.split()) < self.min_words:
+            return
+        with self._lock:
+            self._pending = transcript
+            # The worker clears `_worker` under this lock before it exits, so a running worker
+            # is guaranteed to pick up `_pending`
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._drain, name="speculative-retrieval", daemon=True)
+                self._worker.start()
+
+    def _drain(self):
+        # Only the newest transcript matters, so updates arriving mid-search are coalesced
+        while True:
+            with self._lock:
+                text, self._pending = self._pending, None
+                if text is None:
+                    self._worker = None
+                    return
+            try:
+                self._refresh(text)
+            except Exception as e:
+                logger.warning(f"Speculative retrieval failed: {e}")
+
+    def _refresh(self, text: str, timer: Optional[StageTimer] = None):
+        start = time.perf_counter()
+        vector = self.query_model.embed_query(text)
+        if timer is not None:
+            timer.record("embed", time.perf_counter() - start)
+        with self._lock:
+            self._text, self._vector = text, vector
+            searched = self._searched_vector
+        if searched is not None and cosine_distance(vector, searched) <= self.refresh_distance:
+            return
+        start = time.perf_counter()
+        results = dense_search(vector, self.vector_name)
+        if timer is not None:
+            timer.record("search", time.perf_counter() - start)
+        with self._lock:
+            self._searched_vector, self._dense_results = vector, results
+            self.searches += 1
+
+    def finish(self, transcript: str, timer: StageTimer) -> tuple:
+        """(query vector, dense results) for the final transcript"""
+        with timer.stage("speculative_wait"):
+            with self._lock:
+                worker = self._worker
+            if worker is not None:
+                worker.join()
+        with self._lock:
+            speculative = self._dense_results is not None
+            searches = self.searches
+            stale = self._text != transcript or self._dense_results is None
+        if stale:
+            self._refresh(transcript, timer)
+        if not speculative:
+            outcome = "cold"  # the transcript was too short, or came in a single segment
+        else:
+            outcome = "refreshed" if self.searches > searches else "reused"
+        metrics.increment("speculative_retrieval", outcome, label="outcome")
+        return self._vector, self._dense_results
+
+
+def _plan_answer(user_question: str, query_vector, dense_results, timer: StageTimer,
+                 vector_name: Optional[str] = None) -> dict:
+    """
+    Decide which path serves a question. The "direct", "cache" and "no_docs" plans already
+    carry the answer; the "llm" plan carries the prompt to generate it from.
+    """
+    cache = get_answer_cache(vector_name)
+    plan = {"timer": timer, "answer_cache": cache}
+    direct_doc = direct_answer_doc(dense_results)
+    if direct_doc is not None:
+        return {**plan, "path": "direct", "answer": direct_doc.metadata.get("answer", ""),
+                "doc_ids": [direct_doc.metadata.get("_id")]}
+
+    with timer.stage("refine"):
+        docs = refine_docs(user_question, [doc for doc, _ in dense_results])
+    if not docs:
+        return {**plan, "path": "no_docs", "answer": NO_DOCS_ANSWER, "doc_ids": []}
+
+    doc_ids = [doc.metadata.get("_id") for doc in docs]
+    if ANSWER_CACHE_ENABLED:
+        cached = cache.get(query_vector, doc_ids)
+        if cached is not None:
+            return {**plan, "path": "cache", "answer": cached, "doc_ids": doc_ids}
+
+    with timer.stage("context"):
+        prompt, prompt_tokens = build_prompt(user_question, docs)
+    if prompt is None:
+        return {**plan, "path": "no_docs", "answer": NO_DOCS_ANSWER, "doc_ids": []}
+    return {**plan, "path": "llm", "prompt": prompt, "prompt_tokens": prompt_tokens,
+            "doc_ids": doc_ids, "query_vector": query_vector}
+
+
+def _finish(plan: dict, start: float) -> dict:
+    timer = plan["timer"]
+    timer.record("total", time.perf_counter() - start)
+    metrics.increment("answers", plan["path"])
+    logger.debug("Answered via %s in %s", plan["path"],
+                 ", ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in timer.timings.items()))
+    return {"answer": plan["answer"], "path": plan["path"], "doc_ids": plan["doc_ids"],
+            "prompt_tokens": plan.get("prompt_tokens", 0), "timings": dict(timer.timings)}
+
+
+def _complete(plan: dict, start: float) -> dict:
+    if plan["path"] == "llm":
+        with plan["timer"].stage("llm"):
+            plan["answer"] = llm.invoke(plan["prompt"])
+        if ANSWER_CACHE_ENABLED:
+            plan["answer_cache"].put(plan["query_vector"], plan["doc_ids"], plan["answer"])
+    return _finish(plan, start)
+
+
+# 6. Generate Answer
+def answer_question(user_question: str, vector_name: Optional[str] = None) -> dict:
+    """
+    Answer a question; the result says which path ("direct", "cache", "llm", "no_docs")
+    served it, how many tokens the prompt had (0 when the LLM was not called) and the
+    seconds spent in each pipeline stage.
+    """
+    start = time.perf_counter()
+    timer = metrics.timer()
+    query_model, _ = vector_backend(vector_name)
+    with timer.stage("embed"):
+        query_vector = query_model.embed_query(user_question)
+    with timer.stage("search"):
+        dense_results = dense_search(query_vector, vector_name)
+    return _complete(_plan_answer(user_question, query_vector, dense_results, timer, vector_name), start)
+
+
+def generate_safe_answer(user_question: str, vector_name: Optional[str] = None):
+    return answer_question(user_question, vector_name)["answer"]
+
+
+def answer_questions(questions: List[str], max_concurrency: int = LLM_MAX_CONCURRENCY,
+                     vector_name: Optional[str] = None) -> List[dict]:
+    """
+    Answer many questions at once: one batched embedding pass, batched Qdrant searches, then
+    LLM calls with at most `max_concurrency` in flight. Results keep the input order. Each
+    question's "total" runs from when a worker picks it up; the shared embedding and search
+    time is recorded once, in the "batch_embed" and "batch_search" stages.
+    """
+    if not questions:
+        return []
+    batch_timer = metrics.timer()
+    query_model, _ = vector_backend(vector_name)
+    with batch_timer.stage("batch_embed"):
+        query_vectors = query_model.embed_documents(questions)
+    with batch_timer.stage("batch_search"):
+        results_per_question = dense_search_batch(query_vectors, vector_name)
+
+    def answer(item) -> dict:
+        question, query_vector, dense_results = item
+        start = time.perf_counter()
+        return _complete(_plan_answer(question, query_vector, dense_results, metrics.timer(), vector_name), start)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        return list(executor.map(answer, zip(questions, query_vectors, results_per_question)))
+
+
+def generate_safe_answers(questions: List[str], max_concurrency: int = LLM_MAX_CONCURRENCY,
+                          vector_name: Optional[str] = None) -> List[str]:
+    return [result["answer"] for result in answer_questions(questions, max_concurrency, vector_name)]
+
+
+def stream_safe_answer(user_question: str, timings: Optional[dict] = None,
+                       vector_name: Optional[str] = None,
+                       retrieval: Optional[SpeculativeRetrieval] = None) -> Iterator[str]:
+    """
+    Streaming variant of generate_safe_answer: yields answer tokens as llama3 produces them.
+    If `timings` is given, it receives the serving 'path', 'prompt_tokens', per-stage 'stages'
+    and, when the LLM ran, 'time_to_first_token' and 'generation_time' in seconds.
+    A voice question passes the SpeculativeRetrieval fed while it was being transcribed.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    timer = metrics.timer()
+    if retrieval is not None:
+        vector_name = retrieval.vector_name
+        query_vector, dense_results = retrieval.finish(user_question, timer)
+    else:
+        query_model, _ = vector_backend(vector_name)
+        with timer.stage("embed"):
+            query_vector = query_model.embed_query(user_question)
+        with timer.stage("search"):
+            dense_results = dense_search(query_vector, vector_name)
+    plan = _plan_answer(user_question, query_vector, dense_results, timer, vector_name)
+    timings["path"] = plan["path"]
+    timings["prompt_tokens"] = plan.get("prompt_tokens", 0)
+    timings["stages"] = timer.timings
+
+    if plan["path"] != "llm":
+        _finish(plan, start)
+        yield plan["answer"]
+        return
+
+    llm_start = time.perf_counter()
+    chunks = []
+    for chunk in llm.stream(plan["prompt"]):
+        if not chunks:
+            timings["time_to_first_token"] = time.perf_counter() - llm_start
+            timer.record("llm_first_token", timings["time_to_first_token"])
+        chunks.append(chunk)
+        yield chunk
+    timings["generation_time"] = time.perf_counter() - llm_start
+    timer.record("llm", timings["generation_time"])
+
+    plan["answer"] = "".join(chunks)
+    _finish(plan, start)
+    if ANSWER_CACHE_ENABLED:
+        plan["answer_cache"].put(query_vector, plan["doc_ids"], plan["answer"])
@@ -0,0 +1,170 @@
+# pipeline_metrics.py
+"""
+In-process latency metrics for the RAG pipeline.
+Each stage keeps cumulative Prometheus-style buckets and a window of recent samples for p50/p95/p99.
+"""
+import bisect
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 2048):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._recent = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self._recent.append(seconds)
+
+    def quantiles(self) -> Dict[float, float]:
+        if not self._recent:
+            return {q: 0.0 for q in QUANTILES}
+        samples = sorted(self._recent)
+        return {q: samples[min(int(q * len(samples)), len(samples) - 1)] for q in QUANTILES}
+
+
+class StageTimer:
+    """Collects the stage timings of one request and reports them to the shared metrics"""
+
+    def __init__(self, metrics: "PipelineMetrics"):
+        self.metrics = metrics
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+        self.metrics.observe(name, seconds)
+
+
+class PipelineMetrics:
+    def __init__(self, namespace: str = "medimind"):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._stages: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[str, Counter] = {}
+        self._counter_labels: Dict[str, str] = {}
+
+    def timer(self) -> StageTimer:
+        return StageTimer(self)
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, value: str, label: str = "path", amount: int = 1):
+        """Add to counter `name`, broken down by `label`=`value`"""
+        with self._lock:
+            self._counter_labels.setdefault(name, label)
+            self._counters.setdefault(name, Counter())[value] += amount
+
+    def counter(self, name: str) -> Counter:
+        with self._lock:
+            return Counter(self._counters.get(name, {}))
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Per-stage count, mean and p50/p95/p99 in seconds"""
+        with self._lock:
+            result = {}
+            for stage, histogram in self._stages.items():
+                quantiles = histogram.quantiles()
+                result[stage] = {
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                    "p50": quantiles[0.5],
+                    "p95": quantiles[0.95],
+                    "p99": quantiles[0.99],
+                }
+            return result
+
+    def prometheus_text(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        ns = self.namespace
+        lines = [
+            f"# HELP {ns}_stage_duration_seconds Time spent in each RAG pipeline stage.",
+            f"# TYPE {ns}_stage_duration_seconds histogram",
+        ]
+        quantile_lines = [
+            f"# HELP {ns}_stage_latency_seconds Recent per-stage latency quantiles.",
+            f"# TYPE {ns}_stage_latency_seconds summary",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{ns}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{ns}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{ns}_stage_duration_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{ns}_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+                for q, value in histogram.quantiles().items():
+                    quantile_lines.append(f'{ns}_stage_latency_seconds{{stage="{stage}",quantile="{q}"}} {value}')
+                quantile_lines.append(f'{ns}_stage_latency_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                quantile_lines.append(f'{ns}_stage_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines.extend(quantile_lines)
+            for name, counter in sorted(self._counters.items()):
+                lines.append(f"# TYPE {ns}_{name}_total counter")
+                label = self._counter_labels[name]
+                for value, count in sorted(counter.items()):
+                    lines.append(f'{ns}_{name}_total{{{label}="{value}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def start_metrics_server(metrics: PipelineMetrics, port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Serve GET /metrics from a daemon thread; only the first call per port starts a server"""
+    with _servers_lock:
+        if port in _servers:
+            return _servers[port]
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError:
+            # Another process (e.g. a second Streamlit worker) already serves this port
+            _servers[port] = None
+            return None
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+        _servers[port] = server
+        return server
@@ -0,0 +1,136 @@
+# reranker.py
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from sentence_transformers import CrossEncoder
+
+from answer_cache import read_collection_generation
+
+
+def pair_text(doc) -> str:
+    return f"Q: {doc.page_content}\nA: {doc.metadata.get('answer', '')}"
+
+
+class CrossEncoderReranker:
+    """
+    Scores (question, Q&A pair) candidates with a CPU cross-encoder in one batch and keeps the best ones.
+    Reranking is skipped when the estimated scoring time of the uncached candidates exceeds the budget.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 collection_name: Optional[str] = None, time_budget_ms: float = 150.0,
+                 cache_size: int = 10000, generation_check_interval: float = 5.0,
+                 skip_decay: float = 0.9):
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.collection_name = collection_name
+        self.time_budget_ms = time_budget_ms
+        self.cache_size = cache_size
+        self.generation_check_interval = generation_check_interval
+
+        # Running estimate of scoring cost, refined after each batch. Every skipped query lowers
+        # it by `skip_decay`, so one slow batch cannot disable reranking for good: the estimate
+        # drifts back under the budget and the next scored batch measures the real cost again.
+        self.ms_per_pair = 5.0
+        self.batch_overhead_ms = 5.0
+        self.skip_decay = skip_decay
+
+        self.skipped = 0
+        self.reranked = 0
+        self.cache_hits = 0
+
+        self._lock = threading.Lock()
+        self._scores = OrderedDict()  # (query, doc_id) -> score, least recently used first
+        self._generation = read_collection_generation(collection_name) if collection_name else ""
+        self._generation_checked_at = time.monotonic()
+        self._warm_up()
+
+    def _warm_up(self, n_pairs: int = 16):
+        """Run the cold first call now, then seed the estimate from a warm batch"""
+        pairs = [("warm up", f"Q: warm up {i}\nA: warm up") for i in range(n_pairs)]
+        self.model.predict(pairs[:1], batch_size=1)
+        start = time.perf_counter()
+        self.model.predict(pairs, batch_size=n_pairs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.ms_per_pair = max((elapsed_ms - self.batch_overhead_ms) / n_pairs, 0.0)
+
+    def _check_generation(self):
+        if not self.collection_name:
+            return
+        now = time.monotonic()
+        if now - self._generation_checked_at < self.generation_check_interval:
+            return
+        self._generation_checked_at = now
+        generation = read_collection_generation(self.collection_name)
+        if generation != self._generation:
+            self._generation = generation
+            self._scores.clear()
+
+    def _cached_scores(self, query: str, docs) -> List[Optional[float]]:
+        with self._lock:
+            self._check_generation()
+            scores = []
+            for doc in docs:
+                key = (query, doc.metadata.get("_id"))
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                    self.cache_hits += 1
+                scores.append(score)
+            return scores
+
+    def _store(self, query: str, docs, scores):
+        with self._lock:
+            for doc, score in zip(docs, scores):
+                self._scores[(query, doc.metadata.get("_id"))] = score
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+
+    def estimated_ms(self, n_pairs: int) -> float:
+        return self.batch_overhead_ms + self.ms_per_pair * n_pairs if n_pairs else 0.0
+
+    def rerank(self, query: str, docs, top_n: int, min_score: Optional[float] = None,
+               fallback_k: Optional[int] = None):
+        """
+        Return the `top_n` best docs (and only those scoring at least `min_score`).
+        If scoring would exceed the time budget, return the first `fallback_k` docs unchanged.
+        """
+        if not docs:
+            return docs
+        scores = self._cached_scores(query, docs)
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            if self.estimated_ms(len(missing)) > self.time_budget_ms:
+                self.skipped += 1
+                self.ms_per_pair *= self.skip_decay
+                return list(docs[:fallback_k or top_n])
+            start = time.perf_counter()
+            new_scores = self.model.predict(
+                [(query, pair_text(docs[i])) for i in missing], batch_size=len(missing)
+            )
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.ms_per_pair = 0.8 * self.ms_per_pair + 0.2 * max(
+                (elapsed_ms - self.batch_overhead_ms) / len(missing), 0.0
+            )
+            new_scores = [float(s) for s in new_scores]
+            self._store(query, [docs[i] for i in missing], new_scores)
+            for i, score in zip(missing, new_scores):
+                scores[i] = score
+
+        self.reranked += 1
+        ranked = sorted(zip(docs, scores), key=lambda pair: pair[1], reverse=True)
+        return [
+            doc for doc, score in ranked[:top_n]
+            if min_score is None or score >= min_score
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "reranked": self.reranked,
+            "skipped_over_budget": self.skipped,
+            "score_cache_hits": self.cache_hits,
+            "score_cache_entries": len(self._scores),
+            "ms_per_pair": self.ms_per_pair,
+        }
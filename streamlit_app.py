@@ -1,9 +1,27 @@
 import streamlit as st
-from model import generate_safe_answer
-from audio_utils import record_audio, transcribe_audio, synthesize_speech
+from model import (SpeculativeRetrieval, stream_safe_answer, metrics, serve_metrics, answer_cache, NO_DOCS_ANSWER,
+                   QDRANT_VECTOR_NAME, VECTOR_MODELS)
+from audio_utils import (record_utterance, stream_transcription, transcribe_pcm, synthesize_speech_bytes,
+                         presynthesize, speech_cache)
+from transcription import get_transcriber
 
 from appointment_booking.appointment_agent.graph import app_graph
 st.set_page_config(page_title="MEDIMIND", page_icon="🩺")
+serve_metrics()  # no-op unless MEDIMIND_METRICS_PORT is set
+# One Whisper model per process, shared by all sessions; load it before the first voice question
+transcriber = get_transcriber(metrics=metrics)
+if transcriber.load_seconds is None:
+    transcriber.preload()
+
+APPOINTMENT_GREETING = "Hello! I'm here to help you book an appointment. How can I assist you today?"
+# Fixed bot messages are synthesized once, in the background, so they play without a TTS wait
+presynthesize([
+    APPOINTMENT_GREETING,
+    NO_DOCS_ANSWER,
+    "I recommend speaking to a medical professional for accurate advice.",
+    "Sorry, I couldn't process your message. Please try again.",
+    "Sorry, I encountered an error. Please try again.",
+])
 st.title("MEDIMIND - Your AI Medical Assistant")
 st.markdown("Ask a medical question and get AI-powered responses based on trusted data.")
 
@@ -18,32 +36,64 @@ if mode == "Medical Q&A":
 else:
     st.session_state.chat_mode = "appointment"
 
+# --- Admin: per-stage latency of the Q&A pipeline ---
+with st.sidebar.expander("Pipeline metrics (admin)"):
+    stages = metrics.snapshot()
+    if stages:
+        st.table([
+            {"stage": stage, "count": m["count"], "p50 ms": round(m["p50"] * 1000, 1),
+             "p95 ms": round(m["p95"] * 1000, 1), "p99 ms": round(m["p99"] * 1000, 1)}
+            for stage, m in sorted(stages.items())
+        ])
+    else:
+        st.write("No questions answered yet.")
+    st.write("Answers by path:", dict(metrics.counter("answers")))
+    st.write("Answer cache:", answer_cache.stats())
+    st.write("Speech cache:", speech_cache.stats())
+    # Multi-model collections: switch the embedding model used for retrieval (A/B comparison)
+    vector_name = QDRANT_VECTOR_NAME
+    if QDRANT_VECTOR_NAME is not None:
+        names = sorted(VECTOR_MODELS)
+        vector_name = st.selectbox("Retrieval vector", names, index=names.index(QDRANT_VECTOR_NAME))
+
 # --- Medical Q&A Chatbot ---
 if st.session_state.chat_mode == "qa":
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
     if "text_input" not in st.session_state:
         st.session_state.text_input = ""
+    if "pending_question" not in st.session_state:
+        st.session_state.pending_question = None  # answered (streamed) below the chat history
 
     def handle_text_submit():
         user_input = st.session_state.text_input
         if user_input.strip() == "":
             return
         st.session_state.chat_history.append(("user", user_input))
-        response = generate_safe_answer(user_input)
-        st.session_state.chat_history.append(("bot", response))
+        st.session_state.pending_question = user_input
+        st.session_state.pending_retrieval = None
         st.session_state.text_input = ""  # Clear the input safely here
 
     st.text_input("Type your question:", key="text_input", on_change=handle_text_submit)
     # Audio input section (inside the QA block)
     if st.button("🎙️ Ask by Voice"):
-        with st.spinner("Recording your question..."):
-            audio_path = record_audio(duration=5)
-            transcription, _ = transcribe_audio(audio_path)
+        with st.spinner("Listening... (stops when you pause)"):
+            samples = record_utterance()
+        if len(samples) == 0:
+            st.warning("No speech detected, please try again.")
+        else:
+            # Retrieval runs on the partial transcript while the remaining segments are decoded
+            retrieval = SpeculativeRetrieval(vector_name)
+            segments = []
+            with st.spinner("Transcribing..."):
+                for segment in stream_transcription(samples):
+                    segments.append(segment)
+                    retrieval.update(" ".join(segments))
+            transcription = " ".join(segments)
             st.success("Transcription complete!")
             st.session_state.chat_history.append(("user", transcription))
-            response = generate_safe_answer(transcription)
-            st.session_state.chat_history.append(("bot", response))
+            st.session_state.pending_question = transcription
+            st.session_state.pending_retrieval = retrieval
 
     st.markdown("---")
     for speaker, text in st.session_state.chat_history:
@@ -52,9 +102,26 @@ if st.session_state.chat_mode == "qa":
         else:
             #st.markdown(f"🤖 **Bot:** {text}")
             st.markdown(f"🤖 **Bot:** {text}")
-            audio_path = synthesize_speech(text)
-            with open(audio_path, "rb") as audio_file:
-                st.audio(audio_file.read(), format="audio/wav")
+            st.audio(synthesize_speech_bytes(text), format="audio/wav")
+
+    # Stream the answer to the latest question token by token
+    if st.session_state.pending_question:
+        question = st.session_state.pending_question
+        st.session_state.pending_question = None
+        retrieval = st.session_state.pop("pending_retrieval", None)
+        timings = {}
+        st.markdown("🤖 **Bot:**")
+        response = st.write_stream(stream_safe_answer(question, timings=timings, vector_name=vector_name,
+                                                      retrieval=retrieval))
+        st.session_state.chat_history.append(("bot", response))
+        if "time_to_first_token" in timings:
+            st.caption(f"First token after {timings['time_to_first_token']:.2f}s, "
+                       f"full answer in {timings['generation_time']:.2f}s "
+                       f"({timings['prompt_tokens']} prompt tokens)")
+        elif timings.get("path") in ("direct", "cache"):
+            st.caption("Answered from the knowledge base" if timings["path"] == "direct"
+                       else "Answered from cache")
+        st.audio(synthesize_speech_bytes(response), format="audio/wav")
 
 # --- Appointment Booking Chatbot ---
 else:
@@ -79,8 +146,7 @@ else:
 
     # On first entry, greet the user
     if not st.session_state.appt_state["greeting_sent"] and not st.session_state.appt_chat_history:
-        greeting = "Hello! I'm here to help you book an appointment. How can I assist you today?"
-        st.session_state.appt_chat_history.append(("bot", greeting))
+        st.session_state.appt_chat_history.append(("bot", APPOINTMENT_GREETING))
         st.session_state.appt_state["greeting_sent"] = True
 
     def handle_appt_text_submit():
@@ -102,9 +168,13 @@ else:
 
     st.text_input("Type your message:", key="appt_text_input", on_change=handle_appt_text_submit)
     if st.button("🎙️ Speak to Book"):
-        with st.spinner("Recording your message..."):
-            audio_path = record_audio(duration=5)
-            transcription, _ = transcribe_audio(audio_path)
+        with st.spinner("Listening... (stops when you pause)"):
+            samples = record_utterance()
+        if len(samples) == 0:
+            st.warning("No speech detected, please try again.")
+        else:
+            with st.spinner("Transcribing..."):
+                transcription, _ = transcribe_pcm(samples)
             st.success("Transcription complete!")
             st.session_state.appt_chat_history.append(("user", transcription))
             st.session_state.appt_state["user_messages"].append(transcription)
@@ -126,9 +196,7 @@ else:
             st.markdown(f"🧑‍💬 **You:** {text}")
         else:
             st.markdown(f"🤖 **Bot:** {text}")
-            audio_path = synthesize_speech(text)
-            with open(audio_path, "rb") as audio_file:
-                st.audio(audio_file.read(), format="audio/wav")
+            st.audio(synthesize_speech_bytes(text), format="audio/wav")
     # Show confirmation if appointment is booked
     appt = st.session_state.appt_state
     if appt.get("confirmed") and appt.get("date") and appt.get("time"):
@@ -0,0 +1,36 @@
+import numpy as np
+
+from ingestion.embedding_cache import EmbeddingCache
+
+
+def _vector(value):
+    return np.full(4, value, dtype=np.float32)
+
+
+def test_two_instances_on_one_namespace(tmp_path):
+    a = EmbeddingCache(str(tmp_path), "model")
+    b = EmbeddingCache(str(tmp_path), "model")
+
+    a.add(["x"], [_vector(1.0)])
+    b.add(["y"], [_vector(2.0)])
+    a.add(["z"], [_vector(3.0)])
+
+    for cache in (a, b, EmbeddingCache(str(tmp_path), "model")):
+        vectors, missing = cache.lookup(["x", "y", "z"])
+        assert missing == []
+        assert [float(v[0]) for v in vectors] == [1.0, 2.0, 3.0]
+        assert cache.n_rows == 3
+
+
+def test_reload_after_another_instance_compacts(tmp_path):
+    a = EmbeddingCache(str(tmp_path), "model")
+    b = EmbeddingCache(str(tmp_path), "model")
+    a.add(["x", "y"], [_vector(1.0), _vector(2.0)])
+    assert b.lookup(["y"])[1] == []
+
+    a.compact(keep=["y"])
+    b.add(["z"], [_vector(3.0)])
+
+    vectors, missing = a.lookup(["x", "y", "z"])
+    assert missing == [0]
+    assert [float(v[0]) for v in vectors[1:]] == [2.0, 3.0]
@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+
+from ingestion import pipeline
+from ingestion.config import IngestConfig
+from ingestion.pipeline import IngestPipeline
+
+
+class FakeCollection:
+    """
+    Stands in for the Qdrant writer, payload writer and deleter, recording which points each run
+    writes (a pipelined run re-sends its last chunk to confirm the upserts, which is not new work)
+    """
+
+    def __init__(self):
+        self.points = {}
+        self.written = set()
+        self.fail_calls = set()  # writer calls (1-based, per run) that raise
+        self._calls = 0
+
+    def new_run(self):
+        self.written = set()
+        self._calls = 0
+
+    def writer(self, points, wait=True):
+        self._calls += 1
+        if self._calls in self.fail_calls:
+            raise RuntimeError("upsert rejected")
+        for point in points:
+            self.points[point.id] = point.payload
+            self.written.add(point.id)
+
+    def payload_writer(self, updates, wait=True):
+        for point_id, payload in updates:
+            self.points[point_id] = payload
+            self.written.add(point_id)
+
+    def deleter(self, ids):
+        for point_id in ids:
+            self.points.pop(point_id, None)
+            self.written.add(point_id)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    rows = [{"question": f"question {i}", "answer": f"answer {i}", "tags": "a"} for i in range(40)]
+    # Same question and answer as row 3 (so the same content point id), other tags
+    rows.insert(25, {"question": "question 3", "answer": "answer 3", "tags": "b"})
+    path = tmp_path / "corpus.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def rebuilt(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pipeline, "mark_collection_rebuilt", calls.append)
+    return calls
+
+
+def _run(collection, corpus, tmp_path, mode, **overrides):
+    collection.new_run()
+    config = IngestConfig(csv_file=corpus, chunk_size=10, vector_size=2, mode=mode, state_dir=str(tmp_path / "state"),
+                          embedding_cache_dir=None, length_bucketing=False, **overrides)
+    IngestPipeline(config, embedder=lambda texts: [[1.0, 0.0]] * len(texts), writer=collection.writer,
+                   payload_writer=collection.payload_writer, deleter=collection.deleter).run()
+    return len(collection.written)
+
+
+@pytest.mark.parametrize("mode", ["sequential", "pipelined"])
+def test_diff_of_unchanged_corpus_writes_nothing(corpus, tmp_path, rebuilt, mode):
+    collection = FakeCollection()
+    assert _run(collection, corpus, tmp_path, mode) == 40
+    tags = [payload["metadata"]["tags"] for payload in collection.points.values()
+            if payload["page_content"] == "question 3"]
+    assert tags == [["a", "b"]]
+
+    rebuilt.clear()
+    for _ in range(2):
+        assert _run(collection, corpus, tmp_path, mode, diff=True) == 0
+    assert rebuilt == []
+    assert len(collection.points) == 40
+
+
+@pytest.mark.parametrize("mode", ["sequential", "pipelined"])
+def test_resume_writes_only_the_failed_chunk(corpus, tmp_path, rebuilt, mode):
+    collection = FakeCollection()
+    collection.fail_calls = {2}
+    assert _run(collection, corpus, tmp_path, mode, upsert_workers=1) == 30
+
+    collection.fail_calls = set()
+    assert _run(collection, corpus, tmp_path, mode) == 10
+    assert len(collection.points) == 40
+
+    rebuilt.clear()
+    assert _run(collection, corpus, tmp_path, mode, diff=True) == 0
+    assert rebuilt == []
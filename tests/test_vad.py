@@ -0,0 +1,43 @@
+import numpy as np
+import scipy.io.wavfile as wav
+
+from vad import VADConfig, capture_utterance, wav_blocks
+
+SAMPLE_RATE = 16000
+
+
+def _write_wav(path, *segments):
+    """segments: (seconds, amplitude) of a 220 Hz tone, amplitude 0 for silence, written as int16"""
+    parts = []
+    for seconds, amplitude in segments:
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        noise = np.random.default_rng(0).normal(0, 1e-4, len(t))
+        parts.append(amplitude * np.sin(2 * np.pi * 220 * t) + noise)
+    samples = np.concatenate(parts)
+    wav.write(path, SAMPLE_RATE, (samples * 32767).astype(np.int16))
+    return str(path)
+
+
+def _capture(path):
+    sample_rate, blocks = wav_blocks(path)
+    return capture_utterance(blocks, sample_rate, VADConfig())
+
+
+def test_speech_from_the_first_frame_is_kept(tmp_path):
+    utterance = _capture(_write_wav(tmp_path / "talking.wav", (1.0, 0.3), (1.0, 0.0)))
+    assert utterance.speech_started
+    assert utterance.stopped_by == "silence"
+    assert utterance.seconds >= 0.9
+
+
+def test_stops_on_trailing_silence(tmp_path):
+    utterance = _capture(_write_wav(tmp_path / "question.wav", (0.5, 0.0), (1.5, 0.3), (2.0, 0.0), (1.0, 0.3)))
+    assert utterance.stopped_by == "silence"
+    assert 1.5 <= utterance.seconds < 2.2
+    assert utterance.captured_seconds < 3.0  # the source is not read past the pause
+
+
+def test_silence_is_not_speech(tmp_path):
+    utterance = _capture(_write_wav(tmp_path / "silence.wav", (6.0, 0.0)))
+    assert not utterance.speech_started
+    assert utterance.stopped_by == "no_speech"
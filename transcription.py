@@ -0,0 +1,192 @@
+# transcription.py
+"""
+Resident faster-whisper transcription service.
+
+The Whisper model is loaded once per process and shared by every Streamlit session. Requests
+run on a bounded pool of decode threads; faster-whisper's `num_workers` lets that many
+transcriptions run on the one model at the same time. Model load time and each request's queue
+wait and decode time are recorded separately (stages "transcribe_load", "transcribe_wait" and
+"transcribe_decode" of a PipelineMetrics). `stream` yields segments while the rest of the audio
+is still being decoded, so callers can start work on the partial transcript.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+from pipeline_metrics import PipelineMetrics
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # end of a streamed transcription
+
+WHISPER_MODEL_SIZE = "base"
+WHISPER_DEVICE = "cpu"
+WHISPER_COMPUTE_TYPE = "int8"
+WHISPER_CPU_THREADS = 2  # per decode worker
+WHISPER_NUM_WORKERS = 2  # transcriptions decoded concurrently
+WHISPER_MAX_PENDING = 8  # queued requests beyond the running ones before callers are turned away
+WHISPER_BEAM_SIZE = 2
+
+
+@dataclass(frozen=True)
+class TranscriptionConfig:
+    model_size: str = WHISPER_MODEL_SIZE
+    device: str = WHISPER_DEVICE
+    compute_type: str = WHISPER_COMPUTE_TYPE
+    cpu_threads: int = WHISPER_CPU_THREADS
+    num_workers: int = WHISPER_NUM_WORKERS
+    max_pending: int = WHISPER_MAX_PENDING
+    beam_size: int = WHISPER_BEAM_SIZE
+
+
+@dataclass
+class Transcription:
+    text: str
+    language: str
+    wait_seconds: float  # queued behind other requests (includes the model load on first use)
+    decode_seconds: float
+
+
+class TranscriberBusy(RuntimeError):
+    """Every worker is busy and the queue is full"""
+
+
+def load_whisper(config: TranscriptionConfig):
+    from faster_whisper import WhisperModel
+
+    return WhisperModel(
+        model_size_or_path=config.model_size,
+        device=config.device,
+        compute_type=config.compute_type,
+        cpu_threads=config.cpu_threads,
+        num_workers=config.num_workers,
+    )
+
+
+class TranscriptionEngine:
+    """Thread-safe; one instance per process (see get_transcriber)"""
+
+    def __init__(self, config: TranscriptionConfig = TranscriptionConfig(),
+                 metrics: Optional[PipelineMetrics] = None,
+                 model_loader: Callable = load_whisper):
+        self.config = config
+        self.metrics = metrics
+        self.model_loader = model_loader
+        self.load_seconds: Optional[float] = None
+        self._model = None
+        self._preloading = False
+        self._load_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=config.num_workers, thread_name_prefix="whisper")
+        self._slots = threading.BoundedSemaphore(config.num_workers + config.max_pending)
+
+    def _observe(self, stage: str, seconds: float):
+        if self.metrics is not None:
+            self.metrics.observe(stage, seconds)
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    model = self.model_loader(self.config)
+                    self.load_seconds = time.perf_counter() - start
+                    self._observe("transcribe_load", self.load_seconds)
+                    logger.info(f"Loaded Whisper {self.config.model_size} ({self.config.compute_type}) "
+                                f"in {self.load_seconds:.2f}s")
+                    self._model = model
+        return self._model
+
+    def preload(self, background: bool = True):
+        """Load the model now (in a daemon thread by default) so the first request does not wait"""
+        if self._model is not None or self._preloading:
+            return
+        self._preloading = True
+        if background:
+            threading.Thread(target=lambda: self.model, name="whisper-load", daemon=True).start()
+        else:
+            self.model
+
+    def _decode(self, audio, submitted: float, **options) -> Transcription:
+        model = self.model
+        start = time.perf_counter()
+        wait = start - submitted
+        segments, info = model.transcribe(audio, beam_size=self.config.beam_size, **options)
+        # Segments are decoded lazily, while the generator is consumed
+        text = " ".join(segment.text for segment in segments)
+        decode = time.perf_counter() - start
+        self._observe("transcribe_wait", wait)
+        self._observe("transcribe_decode", decode)
+        return Transcription(text=text, language=info.language, wait_seconds=wait, decode_seconds=decode)
+
+    def _run(self, fn, *args, timeout: Optional[float] = 30.0, **kwargs):
+        """Run `fn` on the decode pool, holding one of the bounded request slots until it returns"""
+        if not self._slots.acquire(timeout=timeout):
+            raise TranscriberBusy(f"Transcription queue full ({self.config.num_workers} running, "
+                                  f"{self.config.max_pending} waiting)")
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def submit(self, audio, timeout: Optional[float] = 30.0, **options):
+        """
+        Queue the transcription of `audio` (a file path or 16 kHz float32 samples); returns a Future.
+        Raises TranscriberBusy when no slot frees up within `timeout` seconds.
+        """
+        return self._run(self._decode, audio, time.perf_counter(), timeout=timeout, **options)
+
+    def transcribe(self, audio, timeout: Optional[float] = 30.0, **options) -> Transcription:
+        return self.submit(audio, timeout=timeout, **options).result()
+
+    def _decode_into(self, segments: queue.Queue, audio, submitted: float, **options):
+        try:
+            model = self.model
+            start = time.perf_counter()
+            self._observe("transcribe_wait", start - submitted)
+            decoded, _ = model.transcribe(audio, beam_size=self.config.beam_size, **options)
+            for segment in decoded:
+                segments.put(segment.text)
+            self._observe("transcribe_decode", time.perf_counter() - start)
+        except Exception as e:
+            segments.put(e)
+        finally:
+            segments.put(_DONE)
+
+    def stream(self, audio, timeout: Optional[float] = 30.0, **options) -> Iterator[str]:
+        """Yield the text of each segment as soon as Whisper has decoded it"""
+        segments = queue.Queue()
+        self._run(self._decode_into, segments, audio, time.perf_counter(), timeout=timeout, **options)
+        while True:
+            item = segments.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+_engine: Optional[TranscriptionEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_transcriber(config: Optional[TranscriptionConfig] = None,
+                    metrics: Optional[PipelineMetrics] = None) -> TranscriptionEngine:
+    """The process-wide engine; created by the first call, later arguments only attach metrics"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = TranscriptionEngine(config or TranscriptionConfig(), metrics)
+        elif metrics is not None and _engine.metrics is None:
+            _engine.metrics = metrics
+        return _engine
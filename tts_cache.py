@@ -0,0 +1,158 @@
+# tts_cache.py
+"""
+Content-addressed cache of synthesized speech.
+
+Audio is keyed by a hash of (text, speaker, language, model), so a message is synthesized once
+and replayed from the cache on every later Streamlit rerun. Two tiers:
+    memory  an LRU of WAV bytes bounded by `memory_bytes`, per process
+    disk    <root>/<key[:2]>/<key>.wav, shared by processes and kept across restarts; bounded by
+            `max_bytes`, least recently read files (by mtime, refreshed on each disk hit) evicted first
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from answer_cache import CACHE_DIR
+
+TTS_CACHE_DIR = os.path.join(CACHE_DIR, "tts")
+
+
+def speech_key(text: str, speaker: str, language: str, model: str) -> str:
+    return hashlib.sha256(json.dumps([text, speaker, language, model]).encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    def __init__(self, root: str = TTS_CACHE_DIR, max_bytes: int = 512 * 2**20, memory_bytes: int = 64 * 2**20):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> WAV bytes, least recently used first
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}  # key -> lock, so concurrent requests for one text synthesize it once
+        os.makedirs(root, exist_ok=True)
+        self._disk_size = sum(size for _, size, _ in self._disk_files())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".wav")
+
+    def _disk_files(self):
+        """(path, size, mtime) of every cached file"""
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".wav"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # evicted by another process
+                yield path, stat.st_size, stat.st_mtime
+
+    def _remember(self, key: str, audio: bytes):
+        """Add to the memory tier; caller holds the lock"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = audio
+        self._memory_size += len(audio)
+        while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def file_path(self, key: str) -> Optional[str]:
+        """The cached WAV file of `key`, if it is on disk"""
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return audio
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)  # recently played: last in line for eviction
+        except OSError:
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, audio)
+        return audio
+
+    def put(self, key: str, audio: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        with self._lock:
+            try:
+                replaced = os.path.getsize(path)  # overwriting a key must not count it twice
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            self._remember(key, audio)
+            self._disk_size += len(audio) - replaced
+            over = self._disk_size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self):
+        """Delete the least recently played files until the disk tier fits in `max_bytes`"""
+        with self._lock:
+            files = sorted(self._disk_files(), key=lambda item: item[2])
+            size = sum(item[1] for item in files)
+            for path, file_size, _ in files:
+                if size <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                size -= file_size
+            self._disk_size = size
+
+    def get_or_synthesize(self, key: str, synthesize: Callable[[], bytes]) -> bytes:
+        audio = self.get(key)
+        if audio is not None:
+            return audio
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                audio = self.get(key)  # synthesized by another session meanwhile
+                if audio is None:
+                    with self._lock:
+                        self.misses += 1
+                    audio = synthesize()
+                    self.put(key, audio)
+                return audio
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+    def warm(self, keys_and_synthesizers: Iterable[tuple]):
+        """Make sure each (key, synthesize) pair is cached, e.g. canned bot messages at startup"""
+        for key, synthesize in keys_and_synthesizers:
+            self.get_or_synthesize(key, synthesize)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "synthesized": self.misses,
+                "memory_mb": round(self._memory_size / 2**20, 1),
+                "disk_mb": round(self._disk_size / 2**20, 1),
+            }
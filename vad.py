@@ -0,0 +1,180 @@
+# vad.py
+"""
+Voice-activity-detected capture: read audio in small blocks and stop once the speaker has been
+silent for `trailing_silence_ms`, instead of recording a fixed duration.
+
+The detector is a frame-energy gate with an adaptive noise floor, so it needs no model and
+costs microseconds per frame. Any iterable of sample blocks can be captured from; the live
+microphone and WAV files (for replaying recorded fixtures) are provided:
+
+    python vad.py question.wav          # where the capture of a recorded question would stop
+"""
+import argparse
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class VADConfig:
+    frame_ms: int = 30
+    trailing_silence_ms: int = 800  # silence after speech that ends the utterance
+    max_seconds: float = 15.0  # hard cap on the recording
+    start_timeout_seconds: float = 5.0  # give up when nobody starts speaking
+    min_speech_ms: int = 150  # voiced frames needed before an utterance counts as started
+    pre_roll_ms: int = 200  # audio kept from before the speech onset
+    threshold_db: float = 10.0  # frame energy above the noise floor that counts as speech
+    min_energy_db: float = -50.0  # absolute floor in dBFS, so silence on a clean line is not speech
+    calibration_ms: int = 150  # initial stretch used to measure the background noise
+    max_noise_db: float = -40.0  # the calibration never puts the floor higher, in case speech starts at once
+
+
+@dataclass
+class Utterance:
+    samples: np.ndarray  # float32 mono
+    sample_rate: int
+    speech_started: bool
+    stopped_by: str  # "silence", "max_length", "no_speech" or "end_of_input"
+    captured_seconds: float  # audio read from the source, including the trailing silence
+
+    @property
+    def seconds(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+
+def frame_db(frame: np.ndarray) -> float:
+    """RMS energy of a float frame in dBFS"""
+    rms = float(np.sqrt(np.mean(np.square(frame, dtype=np.float64)))) if len(frame) else 0.0
+    return 20.0 * np.log10(max(rms, 1e-10))
+
+
+class EnergyVAD:
+    """
+    Speech / non-speech per frame. The noise floor starts at the quietest frame of the first
+    `calibration_ms`, capped at `max_noise_db` so that a speaker who is already talking when the
+    capture starts is not taken for background noise, and then follows the non-speech frames:
+    down at once, up slowly.
+    """
+
+    def __init__(self, config: VADConfig = VADConfig()):
+        self.config = config
+        self.noise_db: Optional[float] = None
+        self._calibration_frames = max(1, config.calibration_ms // config.frame_ms)
+        self._seen = 0
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        db = frame_db(frame)
+        self._seen += 1
+        if self._seen <= self._calibration_frames:
+            floor = db if self.noise_db is None else min(self.noise_db, db)
+            self.noise_db = min(floor, self.config.max_noise_db)
+        speech = db > max(self.noise_db + self.config.threshold_db, self.config.min_energy_db)
+        if not speech and self._seen > self._calibration_frames:
+            self.noise_db = db if db < self.noise_db else 0.95 * self.noise_db + 0.05 * db
+        return speech
+
+
+def _frames(blocks: Iterable[np.ndarray], frame_len: int) -> Iterator[np.ndarray]:
+    """Re-cut blocks of any size into frames of `frame_len` samples"""
+    pending = np.zeros(0, dtype=np.float32)
+    for block in blocks:
+        pending = np.concatenate([pending, np.asarray(block, dtype=np.float32).reshape(-1)])
+        while len(pending) >= frame_len:
+            yield pending[:frame_len]
+            pending = pending[frame_len:]
+    if len(pending):
+        yield pending
+
+
+def capture_utterance(blocks: Iterable[np.ndarray], sample_rate: int,
+                      config: VADConfig = VADConfig()) -> Utterance:
+    """Consume `blocks` until the utterance ends; the source is not read past that point"""
+    frame_len = max(1, sample_rate * config.frame_ms // 1000)
+    silence_frames = max(1, config.trailing_silence_ms // config.frame_ms)
+    speech_frames_needed = max(1, config.min_speech_ms // config.frame_ms)
+    pre_roll_frames = config.pre_roll_ms // config.frame_ms
+    max_frames = int(config.max_seconds * 1000 // config.frame_ms)
+    start_timeout_frames = int(config.start_timeout_seconds * 1000 // config.frame_ms)
+
+    vad = EnergyVAD(config)
+    kept = []  # the pre-roll, then every frame since the speech onset
+    started = False
+    voiced_run = 0
+    silent_run = 0
+    read = 0
+    stopped_by = "end_of_input"
+    for frame in _frames(blocks, frame_len):
+        read += 1
+        speech = vad.is_speech(frame)
+        kept.append(frame)
+        if not started:
+            voiced_run = voiced_run + 1 if speech else 0
+            keep = voiced_run + pre_roll_frames
+            kept = kept[-keep:] if keep else []
+            if voiced_run >= speech_frames_needed:
+                started = True
+            elif read >= start_timeout_frames:
+                stopped_by = "no_speech"
+                break
+        else:
+            silent_run = 0 if speech else silent_run + 1
+            if silent_run >= silence_frames:
+                stopped_by = "silence"
+                break
+        if read >= max_frames:
+            stopped_by = "max_length"
+            break
+
+    if started and silent_run:
+        # Keep a short tail so the last word is not clipped
+        kept = kept[:len(kept) - silent_run + min(silent_run, pre_roll_frames)]
+    samples = np.concatenate(kept) if started and kept else np.zeros(0, dtype=np.float32)
+    return Utterance(samples=samples, sample_rate=sample_rate, speech_started=started, stopped_by=stopped_by,
+                     captured_seconds=read * frame_len / sample_rate)
+
+
+def microphone_blocks(sample_rate: int = 16000, block_ms: int = 30) -> Iterator[np.ndarray]:
+    """Live float32 mono blocks from the default input device; the stream closes with the generator"""
+    import sounddevice as sd
+
+    block = sample_rate * block_ms // 1000
+    with sd.InputStream(samplerate=sample_rate, channels=1, dtype="float32", blocksize=block) as stream:
+        while True:
+            data, _ = stream.read(block)
+            yield data[:, 0]
+
+
+def wav_blocks(path: str, block_ms: int = 30) -> tuple:
+    """(sample rate, float32 mono blocks) of a WAV file, to replay a recorded fixture"""
+    import scipy.io.wavfile as wav
+
+    sample_rate, samples = wav.read(path)
+    if samples.dtype.kind in "iu":
+        samples = samples.astype(np.float32) / np.iinfo(samples.dtype).max
+    samples = samples.astype(np.float32, copy=False)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    block = max(1, sample_rate * block_ms // 1000)
+    return sample_rate, (samples[i:i + block] for i in range(0, len(samples), block))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the voice-activity capture over WAV files")
+    parser.add_argument("wav", nargs="+")
+    parser.add_argument("--trailing-silence-ms", type=int, default=VADConfig.trailing_silence_ms)
+    parser.add_argument("--max-seconds", type=float, default=VADConfig.max_seconds)
+    parser.add_argument("--threshold-db", type=float, default=VADConfig.threshold_db)
+    args = parser.parse_args()
+
+    config = VADConfig(trailing_silence_ms=args.trailing_silence_ms, max_seconds=args.max_seconds,
+                       threshold_db=args.threshold_db)
+    for path in args.wav:
+        sample_rate, blocks = wav_blocks(path, config.frame_ms)
+        utterance = capture_utterance(blocks, sample_rate, config)
+        print(f"{path}: stopped by {utterance.stopped_by} after {utterance.captured_seconds:.2f}s read, "
+              f"{utterance.seconds:.2f}s of speech kept")
+
+
+if __name__ == "__main__":
+    main()